@@ -20,7 +20,11 @@ for var in "${EXPECTED_VARS[@]}"; do
     fi
 done
 
-pytest -svvrs --tb=short ./tests --junitxml=results.xml
+if [ -n "${PYTEST_WORKERS}" ]; then
+    PARALLEL_OPTS="-n ${PYTEST_WORKERS} --dist loadgroup"
+fi
+
+pytest -svvrs --tb=short ${PARALLEL_OPTS} ./tests --junitxml=results.xml
 
 cp ./results.xml ./resultsvolume/
 chmod a+rw ./resultsvolume/results.xml
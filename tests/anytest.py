@@ -41,15 +41,6 @@ def readCacheEnvConfig(metafunc):
     return envConfig
 
 
-def readCacheTextFiles(metafunc, dirPath):
-    if hasattr(metafunc.config, 'fileContents'):
-        fileContents = metafunc.config.fileContents
-    else:
-        fileContents = [(f, readFileLines(os.path.join(dirPath, f))) for f in findTextFiles(dirPath)]
-        metafunc.config.fileContents = fileContents
-    return fileContents
-
-
 def loadEnvConfig(name):
     configAll = yaml.load(open('config.yml'))
     return configAll['env'][name]
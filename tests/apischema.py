@@ -0,0 +1,118 @@
+import re
+import functools
+
+
+# --- Value rules: return an error message or None ---
+
+
+def isoTimestamp():
+    pattern = re.compile(r'^\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}(\.\d{1,7})?(Z|[+-]\d{2}:\d{2})?$')
+
+    def check(value):
+        if not isinstance(value, str) or not pattern.match(value):
+            return f'expected an ISO 8601 timestamp but found {value!r}'
+    return check
+
+
+def nonEmpty():
+    def check(value):
+        if not isinstance(value, str) or not value.strip():
+            return f'expected a non empty string but found {value!r}'
+    return check
+
+
+# --- Endpoint response schemas ---
+
+
+# a schema is a type or tuple of types, a value rule, {'items': schema} for an array
+# or {'fields': {name: schema}, 'optional': {name: schema}, 'extraOk': bool} for an object
+STATUS_FIELDS = {
+    'Status': bool,
+    'CreatedAt': isoTimestamp(),
+    'CreatedBy': nonEmpty(),
+    'Reason': str,
+}
+API_SCHEMAS = {
+    'GetStatus': {'fields': dict(STATUS_FIELDS,
+        # comes from CosmosDB
+        DataSetType=str,
+        _ts=int)},
+    # the set response is only known to echo what test_setStatusToggle asserts, the rest is checked when present
+    'SetStatus': {
+        'fields': {name: STATUS_FIELDS[name] for name in ['Status', 'CreatedBy']},
+        'optional': {name: STATUS_FIELDS[name] for name in ['CreatedAt', 'Reason']},
+        'extraOk': True},
+    'posts': {'items': {'fields': {'userId': int, 'id': int, 'title': str, 'body': str}}},
+}
+
+
+@functools.lru_cache(maxsize=None)
+def validator(name):
+    # compiled once per session, checks a whole response and returns the first problem or None
+    return compileSchema(API_SCHEMAS[name])
+
+
+@functools.lru_cache(maxsize=None)
+def itemValidator(name):
+    # checkItem of an array response for apitest.verifyJsonArray
+    return compileSchema(API_SCHEMAS[name]['items'])
+
+
+def compileSchema(schema):
+    if isinstance(schema, dict) and 'items' in schema:
+        return _compileArray(schema)
+    if isinstance(schema, dict):
+        return _compileObject(schema)
+    if isinstance(schema, (type, tuple)):
+        return _compileType(schema)
+    return schema
+
+
+def _compileType(types):
+    types = types if isinstance(types, tuple) else (types,)
+    boolOk = bool in types  # bool is an int to isinstance
+    names = '|'.join(t.__name__ for t in types)
+
+    def check(value):
+        if not isinstance(value, types) or (type(value) is bool and not boolOk):
+            return f'expected {names} but found {value!r}'
+    return check
+
+
+def _compileObject(schema):
+    fields = {name: compileSchema(s) for name, s in schema.get('fields', {}).items()}
+    optional = {name: compileSchema(s) for name, s in schema.get('optional', {}).items()}
+    required = set(fields)
+    allowed = required | set(optional)
+    checks = list(fields.items())
+    extraOk = schema.get('extraOk', False)
+
+    def check(value):
+        if not isinstance(value, dict):
+            return f'expected an object but found {type(value).__name__}'
+        keys = value.keys()
+        if not (keys >= required if extraOk else required <= keys <= allowed):
+            return f'expected fields {sorted(required)} (optional {sorted(optional)}) but found {sorted(keys)}'
+        for name, checkField in checks:
+            problem = checkField(value[name])
+            if problem:
+                return f'{name}: {problem}'
+        for name, checkField in optional.items():
+            if name in value:
+                problem = checkField(value[name])
+                if problem:
+                    return f'{name}: {problem}'
+    return check
+
+
+def _compileArray(schema):
+    checkItem = compileSchema(schema['items'])
+
+    def check(value):
+        if not isinstance(value, list):
+            return f'expected an array but found {type(value).__name__}'
+        for idx, item in enumerate(value):
+            problem = checkItem(item)
+            if problem:
+                return f'item {idx}: {problem}'
+    return check
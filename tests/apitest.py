@@ -1,12 +1,43 @@
 import pytest
+import re
 import json
+import codecs
 import os.path
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import apischema
 
 
-def postJson(url, data, msg='POST ', expectError=False):
+RETRY_STATUSES = (502, 503, 504)
+JSON_SPACE = re.compile(r'[ \t\n\r]*')
+
+
+class TimeoutHTTPAdapter(HTTPAdapter):
+    # requests has no default timeout, a call without one uses timeout=(connectSeconds, readSeconds)
+    def __init__(self, timeout, **kwargs):
+        self.timeout = timeout
+        super().__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        if kwargs.get('timeout') is None:
+            kwargs['timeout'] = self.timeout
+        return super().send(request, **kwargs)
+
+
+def createHttpSession(poolSize=10, retries=3, backoffSeconds=0.3, timeout=(5, 30)):
+    # keep-alive connections are pooled per host, only idempotent methods (not POST) are retried
+    retry = Retry(total=retries, backoff_factor=backoffSeconds, status_forcelist=RETRY_STATUSES, raise_on_status=False)
+    adapter = TimeoutHTTPAdapter(timeout, pool_connections=poolSize, pool_maxsize=poolSize, max_retries=retry)
+    session = requests.Session()
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+def postJson(http, url, data, msg='POST ', expectError=False):
     # print(f'\n{msg}: request={data}')
-    resp = requests.post(url, json=data)
+    resp = http.post(url, json=data)
     # print(f"got resp={resp._code}: {resp.text}")
     if expectError:
         expCodeRange = (400, 499)
@@ -15,26 +46,102 @@ def postJson(url, data, msg='POST ', expectError=False):
     return verifyResponse(resp, isJson=True, respCodeRange=expCodeRange)
 
 
-def verifyResponse(resp, errCtx='', isJson=True, respCodeRange=(200, 300), respEmptyOk=False):
-    errCtx = errCtx + f'response={resp.text[0:1000]}'
-    codeMin, codeMax = respCodeRange
-    assert codeMin <= resp.status_code <= codeMax, \
-        f'response code={resp.status_code} out of range={respCodeRange} {errCtx}'
+def verifyResponse(resp, errCtx='', isJson=True, respCodeRange=(200, 300), respEmptyOk=False, schema=None):
+    # schema names the apischema.API_SCHEMAS entry the JSON result must match
+    verifyStatus(resp, errCtx, respCodeRange)
     if not respEmptyOk:
-        assert resp.content, f'empty response {errCtx}'
+        assert resp.content, f'empty response {responseCtx(resp, errCtx)}'
     if not isJson:
         result = resp.content
     else:
-        expectedContTypes = ['application/json', 'application/json; charset=utf-8', 'text/json; charset=utf-8']
-        assert resp.headers['Content-Type'].lower() in expectedContTypes, errCtx
+        verifyJsonType(resp, errCtx)
         try:
             result = json.loads(resp.content)
         except ValueError:
-            pytest.fail(f'response is not JSON: {errCtx}')
+            pytest.fail(f'response is not JSON: {responseCtx(resp, errCtx)}')
+        if schema:
+            problem = apischema.validator(schema)(result)
+            assert problem is None, f'response does not match schema={schema}: {problem} {responseCtx(resp, errCtx)}'
 
     return result
 
 
+def verifyJsonArray(resp, checkItem, errCtx='', respCodeRange=(200, 299), chunkSize=64 * 1024, maxProblems=10):
+    # resp of a stream=True request, array items are decoded and checked one at a time as they arrive,
+    # checkItem(item) returns a problem message or None
+    verifyStatus(resp, errCtx, respCodeRange)
+    verifyJsonType(resp, errCtx)
+    problems = []
+    count = invalid = 0
+    try:
+        for item in iterJsonArray(resp.iter_content(chunkSize)):
+            problem = checkItem(item)
+            if problem:
+                invalid += 1
+                if len(problems) < maxProblems:
+                    problems.append(f'item {count}: {problem}')
+            count += 1
+    except ValueError as e:
+        pytest.fail(f'response is not a JSON array: {e} {errCtx}')
+    details = '\n'.join(f'  {problem}' for problem in problems)
+    assert not problems, f'{invalid} of {count} items invalid {errCtx}:\n{details}'
+    return count
+
+
+def verifyStatus(resp, errCtx, respCodeRange):
+    codeMin, codeMax = respCodeRange
+    assert codeMin <= resp.status_code <= codeMax, \
+        f'response code={resp.status_code} out of range={respCodeRange} {responseCtx(resp, errCtx)}'
+
+
+def verifyJsonType(resp, errCtx):
+    expectedContTypes = ['application/json', 'application/json; charset=utf-8', 'text/json; charset=utf-8']
+    assert resp.headers['Content-Type'].lower() in expectedContTypes, responseCtx(resp, errCtx)
+
+
+def responseCtx(resp, errCtx=''):
+    # only called from assertion messages, so the body is decoded just when a check fails
+    return errCtx + f'response={resp.text[0:1000]}'
+
+
+def iterJsonArray(chunks, encoding='utf-8'):
+    # yields the items of a JSON array read from byte chunks, holding only the undecoded rest of the stream
+    decoder = json.JSONDecoder()
+    buf, pos, started = '', 0, False
+    for chunk in codecs.iterdecode(chunks, encoding):
+        buf = buf[pos:] + chunk
+        pos = 0
+        while True:
+            pos = JSON_SPACE.match(buf, pos).end()
+            if pos == len(buf):
+                break
+            if not started:
+                if buf[pos] != '[':
+                    raise ValueError(f'expected "[" but found {buf[pos:pos + 20]!r}')
+                started = True
+                pos += 1
+                continue
+            if buf[pos] == ']':
+                return
+            try:
+                item, end = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                break  # item continues in the next chunk
+            nextPos = JSON_SPACE.match(buf, end).end()
+            if nextPos == len(buf):
+                break  # a number may continue in the next chunk, decode it again with more data
+            if buf[nextPos] not in ',]':
+                raise ValueError(f'expected "," or "]" but found {buf[nextPos:nextPos + 20]!r}')
+            yield item
+            pos = nextPos + 1 if buf[nextPos] == ',' else nextPos
+    raise ValueError(f'array not closed, undecoded rest={buf[pos:pos + 100]!r}')
+
+
+def fieldTypes(expected):
+    # checkItem for verifyJsonArray, expected maps each field name to its type(s) or value rule
+    return apischema.compileSchema({'fields': expected})
+
+
 def readJsonFromFile(path, fname):
     fpath = os.path.join(path, fname)
     with open(fpath) as f:
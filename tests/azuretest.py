@@ -1,9 +1,20 @@
+import time
+import json
+import threading
 import anytest
-from os import makedirs, path
+from os import getpid, makedirs, path, remove, replace
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from azure.common import AzureException
+from pydocumentdb.errors import HTTPFailure
 from azure.storage.file import FileService
 
 
-def getCosmosDocById(config, client, docid):
+def getCosmosDocById(config, client, docid, partitionKey=None, waiter=None):
+    if waiter:
+        return waiter.wait(docid, config.get('COSMOSDB_WAIT_SECONDS', 20))
+    if partitionKey is not None:
+        return waitPointReadCosmosDoc(config, client, docid, partitionKey)
     query = f"SELECT * from c WHERE c.id = '{docid}'"
     return waitReadOneCosmosDoc(config, client, query)
 
@@ -24,22 +35,274 @@ def _toReadOneCosmosDoc(config, client, query):
     return read
 
 
-def downloadStoredFiles(config, accountKey, sourceDir, targetDir):
-    fs = FileService(account_name=config['STORAGE_ACCOUNT'], account_key=accountKey)
+def waitPointReadCosmosDoc(config, client, docid, partitionKey):
+    # a point read costs 1 RU, so it can poll much more often than a cross partition query
+    pollSeconds = config.get('COSMOSDB_POLL_SECONDS', 0.2)
+    maxTries = int(config.get('COSMOSDB_WAIT_SECONDS', 20) / pollSeconds) + 1
+    return anytest.retryOnFailure(
+        _toPointReadCosmosDoc(config, client, docid, partitionKey), maxTries, pollSeconds)
+
+
+def _toPointReadCosmosDoc(config, client, docid, partitionKey):
+    docLink = f"{config['COSMOSDB_COLL_PATH']}/docs/{docid}"
+
+    def read():
+        doc = readCosmosDoc(client, docLink, partitionKey)
+        assert doc is not None, f'doc not found link={docLink} partitionKey={partitionKey}'
+        return doc
+    return read
+
+
+_ANY_PARTITION = object()
+
+
+def getCosmosDocsByIds(config, client, docids, partitionKeys=None):
+    # returns found docs by id and the missing ids. Ids with a known partition key (partitionKeys: id -> key)
+    # are batched into single partition IN queries, or a point read when alone in their partition
+    collection = config['COSMOSDB_COLL_PATH']
+    batchSize = config.get('COSMOSDB_IN_BATCH', 100)
+    partitionKeys = partitionKeys or {}
+    uniqueIds = sorted(set(docids))
+    groups = OrderedDict()
+    for docid in uniqueIds:
+        groups.setdefault(partitionKeys.get(docid, _ANY_PARTITION), []).append(docid)
+
+    found = {}
+    for partitionKey, ids in groups.items():
+        if partitionKey is not _ANY_PARTITION and len(ids) == 1:
+            doc = readCosmosDoc(client, f'{collection}/docs/{ids[0]}', partitionKey)
+            if doc is not None:
+                found[doc['id']] = doc
+            continue
+        if partitionKey is _ANY_PARTITION:
+            options = {'enableCrossPartitionQuery': True}
+        else:
+            options = {'partitionKey': partitionKey}
+        for start in range(0, len(ids), batchSize):
+            batch = ids[start:start + batchSize]
+            params = [{'name': f'@id{i}', 'value': docid} for i, docid in enumerate(batch)]
+            query = {
+                'query': f"SELECT * FROM c WHERE c.id IN ({', '.join(p['name'] for p in params)})",
+                'parameters': params,
+            }
+            for doc in client.QueryDocuments(collection, query, options):
+                found[doc['id']] = doc
+
+    missing = [docid for docid in uniqueIds if docid not in found]
+    if missing:
+        print(f'{len(missing)} of {len(uniqueIds)} docs not found in {collection}: {missing}')
+    return found, missing
+
+
+def readCosmosDoc(client, docLink, partitionKey):
+    try:
+        return client.ReadDocument(docLink, {'partitionKey': partitionKey})
+    except HTTPFailure as err:
+        if err.status_code == 404:
+            return None
+        raise
+
+
+class CosmosChangeFeedWaiter:
+    # one reader follows the collection change feed from when it started, any number of tests wait on it.
+    # Needs its own client, the reader thread relies on client.last_response_headers.
+    # Only the maxDocs most recently changed docs are kept, older ones are dropped and counted in droppedDocs
+    def __init__(self, client, collLink, pollSeconds=0.2, maxDocs=10000):
+        self.client = client
+        self.collLink = collLink
+        self.pollSeconds = pollSeconds
+        self.maxDocs = maxDocs
+        self.droppedDocs = 0
+        self.lastError = None
+        self._docs = OrderedDict()  # latest version of recently changed docs by id
+        self._changed = threading.Condition()
+        self._stopped = threading.Event()
+        self._continuations = {rangeId: None for rangeId in readPartitionKeyRangeIds(client, collLink)}
+        self._readChanges()  # positions the feed at now, before any test writes
+        self._reader = threading.Thread(target=self._run, name='cosmosChangeFeed', daemon=True)
+        self._reader.start()
+
+    def wait(self, docid, timeoutSeconds=20):
+        deadline = time.monotonic() + timeoutSeconds
+        with self._changed:
+            while docid not in self._docs:
+                remaining = deadline - time.monotonic()
+                assert remaining > 0, \
+                    f'doc id={docid} not in change feed of {self.collLink} after {timeoutSeconds}s, ' \
+                    f'last error={self.lastError}, older docs dropped={self.droppedDocs} past maxDocs={self.maxDocs}'
+                self._changed.wait(remaining)
+            return self._docs[docid]
+
+    def stop(self):
+        self._stopped.set()
+        self._reader.join()
+
+    def _run(self):
+        while not self._stopped.wait(self.pollSeconds):
+            try:
+                self._readChanges()
+            except Exception as err:  # keep following the feed, waiters report the last error on timeout
+                self.lastError = err
+                print(f'change feed read failed - {err}')
+
+    def _readChanges(self):
+        for rangeId, continuation in self._continuations.items():
+            options = {'partitionKeyRangeId': rangeId}
+            if continuation:
+                options['continuation'] = continuation
+            else:
+                options['isStartFromBeginning'] = False
+            docs = list(self.client.QueryDocumentsChangeFeed(self.collLink, options))
+            self._continuations[rangeId] = self.client.last_response_headers['etag']
+            if docs:
+                with self._changed:
+                    for doc in docs:
+                        self._docs.pop(doc['id'], None)
+                        self._docs[doc['id']] = doc
+                    while len(self._docs) > self.maxDocs:
+                        self._docs.popitem(last=False)
+                        self.droppedDocs += 1
+                    self._changed.notify_all()
+
+
+def readPartitionKeyRangeIds(client, collLink):
+    # the change feed is read per partition key range; pydocumentdb, up to its last release 2.3.5,
+    # only has the listing as _ReadPartitionKeyRanges, the public name is used by clients that have it
+    readRanges = getattr(client, 'ReadPartitionKeyRanges', None) or client._ReadPartitionKeyRanges
+    return [r['id'] for r in readRanges(collLink)]
+
+
+PART_SUFFIX = '.part'
+SYNC_MANIFEST = '.syncmanifest.json'
+
+
+class SyncManifest:
+    # shared by the download threads, saved every saveEvery synced files so a killed run keeps its progress
+    def __init__(self, fpath, saveEvery=50):
+        self.fpath = fpath
+        self.saveEvery = saveEvery
+        self.files = {}  # complete local files by name: remote size, etag and last modified
+        self.parts = {}  # partial downloads, only resumed while the remote file is unchanged
+        self._unsaved = 0
+        self._lock = threading.RLock()
+        if path.exists(fpath):
+            with open(fpath) as f:
+                content = json.load(f)
+            self.files, self.parts = content['files'], content['parts']
+
+    def startFile(self, fname, remote):
+        # returns whether a partial download of fname can be resumed
+        with self._lock:
+            resume = self.parts.get(fname) == remote
+            self.parts[fname] = remote
+            return resume
+
+    def completeFile(self, fname):
+        with self._lock:
+            self.files[fname] = self.parts.pop(fname)
+            self._unsaved += 1
+            if self._unsaved >= self.saveEvery:
+                self.save()
+
+    def save(self):
+        tmpPath = f'{self.fpath}.{getpid()}.tmp'  # concurrent runs syncing one dir never share a temp file
+        with self._lock:
+            with open(tmpPath, 'w') as f:
+                json.dump({'files': self.files, 'parts': self.parts}, f, indent=1)
+            replace(tmpPath, self.fpath)
+            self._unsaved = 0
+
+
+def createFileService(config, accountKey):
+    return FileService(account_name=config['STORAGE_ACCOUNT'], account_key=accountKey)
+
+
+def downloadStoredFiles(config, accountKey, sourceDir, targetDir, fs=None):
+    fs = fs or createFileService(config, accountKey)
     storageLoc = config['STORAGE_LOCATION']
     if not path.exists(targetDir):
         makedirs(targetDir)
     print(f'\nFileService: reading files from Azure Storage location="{storageLoc}" directory="{sourceDir}"')
     if not fs.exists(storageLoc, sourceDir):
         return
-    dirsFiles = fs.list_directories_and_files(storageLoc, sourceDir)
-    fileNames = [df.name for df in dirsFiles if df.name.endswith('.txt') or df.name.endswith('.csv')]
-    for fname in fileNames:
-        if path.exists(path.join(targetDir, fname)):
-            print(f'already got file={fname}')
-        else:
-            print(f'downloading file={fname}')
-            fs.get_file_to_path(storageLoc, sourceDir, fname, path.join(targetDir, fname))
+
+    workers = config.get('STORAGE_DOWNLOAD_WORKERS', 8)
+    maxTries = config.get('STORAGE_DOWNLOAD_TRIES', 3)
+    backoffSeconds = config.get('STORAGE_DOWNLOAD_BACKOFF_SECONDS', 1)
+    manifest = SyncManifest(path.join(targetDir, SYNC_MANIFEST), config.get('STORAGE_MANIFEST_SAVE_EVERY', 50))
+    remoteNames = set()
+    start = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = []
+            # the listing is paged lazily, files are synced while later pages are still being listed
+            for df in fs.list_directories_and_files(storageLoc, sourceDir):
+                if df.name.endswith('.txt') or df.name.endswith('.csv'):
+                    remoteNames.add(df.name)
+                    futures.append(pool.submit(syncWithRetry,
+                        fs, storageLoc, sourceDir, df.name, targetDir, manifest, maxTries, backoffSeconds))
+            totalBytes = sum(future.result() for future in futures)
+        removeDeletedFiles(targetDir, manifest, remoteNames)
+    finally:
+        manifest.save()
+    elapsed = time.perf_counter() - start
+    print(f'synced {len(remoteNames)} files, downloaded {totalBytes} bytes in {elapsed:.2f}s'
+        f' ({totalBytes / max(elapsed, 1e-6) / 1e6:.2f} MB/s) with {workers} workers')
+
+
+def syncWithRetry(fs, storageLoc, sourceDir, fname, targetDir, manifest, maxTries, backoffSeconds):
+    for i in range(1, maxTries + 1):
+        try:
+            return syncFile(fs, storageLoc, sourceDir, fname, targetDir, manifest)
+        except (AzureException, OSError) as err:
+            if i == maxTries:
+                raise
+            sleepSeconds = backoffSeconds * 2 ** (i - 1)
+            print(f'Tried {i} file={fname} - {err}, retry in {sleepSeconds}s')
+            time.sleep(sleepSeconds)
+
+
+def syncFile(fs, storageLoc, sourceDir, fname, targetDir, manifest):
+    props = fs.get_file_properties(storageLoc, sourceDir, fname).properties
+    remote = {
+        'size': props.content_length,
+        'etag': props.etag,
+        'lastModified': props.last_modified.isoformat() if props.last_modified else None,
+    }
+    if manifest.files.get(fname) == remote and path.exists(path.join(targetDir, fname)):
+        print(f'already got file={fname}')
+        return 0
+    resume = manifest.startFile(fname, remote)
+    downloaded = downloadFile(fs, storageLoc, sourceDir, fname, remote['size'], targetDir, resume)
+    manifest.completeFile(fname)
+    return downloaded
+
+
+# downloads into <fname>.part, with resume a partial download continues from where it stopped
+def downloadFile(fs, storageLoc, sourceDir, fname, size, targetDir, resume):
+    filePath = path.join(targetDir, fname)
+    partPath = filePath + PART_SUFFIX
+    have = path.getsize(partPath) if resume and path.exists(partPath) else 0
+    if size is None or have > size:
+        have = 0
+    if size is None or have < size:
+        print(f'downloading file={fname}' + (f' from byte={have}' if have else ''))
+        fs.get_file_to_path(storageLoc, sourceDir, fname, partPath,
+            open_mode='ab' if have else 'wb', start_range=have if have else None, max_connections=1)
+    elif not have:
+        open(partPath, 'wb').close()  # empty remote file, nothing to fetch
+    downloaded = path.getsize(partPath) - have
+    replace(partPath, filePath)
+    return downloaded
+
+
+def removeDeletedFiles(targetDir, manifest, remoteNames):
+    for entries, suffix in [(manifest.files, ''), (manifest.parts, PART_SUFFIX)]:
+        for fname in set(entries) - remoteNames:
+            print(f'removing file={fname + suffix}, deleted from storage')
+            del entries[fname]
+            if path.exists(path.join(targetDir, fname + suffix)):
+                remove(path.join(targetDir, fname + suffix))
 
 
 def downloadCacheStoredFiles(metafunc, config, storeDir, targetDir):
@@ -0,0 +1,139 @@
+import os
+import random
+import datetime
+import bidschema
+
+
+TRADING_INTERVALS = 48
+PRICE_BANDS = [f'PB{i}' for i in range(1, 11)]
+# deliberate defects, each trips exactly one test_bidFiles violation group
+DEFECTS = {
+    'BID FILE': 'sender is not BATTSITE',
+    'DUID serviceType': 'unit is not registered for its service type',
+    'UNIT LIMITS': 'row 01 breaks a unit limit',
+    'BAND AVAILABILITY': 'row 01 has a non numeric band availability',
+    'sections': 'unexpected sub-section in the first BID',
+}
+DASHES = '-' * 30
+
+
+def bidFileName(idx, startDate=datetime.date(2018, 1, 31)):
+    # versions 002-999 of one trading day, then the next day
+    day, version = divmod(idx, 998)
+    tradeDate = startDate + datetime.timedelta(days=day)
+    return f'aemo_benchOFFER_{tradeDate:%Y%m%d}_{version + 2:03d}.txt'
+
+
+# every defectEvery-th file gets a defect, options are passed on to generateBidFile
+def generateBidFiles(dirPath, count, defectEvery=0, seed=0, **options):
+    os.makedirs(dirPath, exist_ok=True)
+    rand = random.Random(seed)
+    defects = list(DEFECTS)
+    fnames = []
+    for idx in range(count):
+        defect = None
+        if defectEvery and idx % defectEvery == defectEvery - 1:
+            defect = defects[(idx // defectEvery) % len(defects)]
+        fname = bidFileName(idx)
+        with open(os.path.join(dirPath, fname), 'w') as f:
+            f.write(generateBidFile(fname, defect=defect, rand=rand, **options))
+        fnames.append(fname)
+    return fnames
+
+
+# BID sections cycle through serviceTypes, each with units DISPATCHABLE UNITs of intervals table rows
+def generateBidFile(fname, bids=2, serviceTypes=None, units=1, intervals=TRADING_INTERVALS, defect=None, rand=None):
+    assert defect is None or defect in DEFECTS, f'unknown defect={defect}, expected one of {list(DEFECTS)}'
+    rand = rand or random.Random(0)
+    serviceTypes = serviceTypes or list(bidschema.SERVICE_TYPES)
+    version = os.path.splitext(fname)[0].split('_')[-1]
+    lines = [DASHES, 'START OF BID FILE', DASHES, '',
+        'To: AEMO',
+        'From: ' + ('OTHERSITE' if defect == 'BID FILE' else 'BATTSITE'),
+        'Issued on: 03/12/2001 00:00',
+        'Authorised by: AUTOBID',
+        f'Version No: {version}', '']
+    for bidIdx in range(bids):
+        serviceType = serviceTypes[bidIdx % len(serviceTypes)]
+        first = bidIdx == 0
+        lines += [DASHES, 'START OF BID', DASHES, '',
+            f'Service Type: {serviceType}',
+            'Trading Date: 17/05/2018', '']
+        if first and defect == 'sections':
+            lines += ['START OF EXTRA', 'END OF EXTRA', '']
+        duids = bidschema.SERVICE_TYPES.get(serviceType, ['BATTGENID'])
+        for unitIdx in range(units):
+            duid = duids[unitIdx % len(duids)]
+            if first and unitIdx == 0 and defect == 'DUID serviceType':
+                duid = 'UNREGISTEREDID'
+            lines += dispatchableUnit(serviceType, duid, intervals, defect if first and unitIdx == 0 else None, rand)
+        lines += [DASHES, 'END OF BID', DASHES, '']
+    lines += ['END OF BID FILE']
+    return '\n'.join(lines) + '\n'
+
+
+def dispatchableUnit(serviceType, duid, intervals, defect, rand):
+    isLoad = duid == 'BATTLOADID'
+    lines = [DASHES, 'START OF DISPATCHABLE UNIT', DASHES, '',
+        f'Dispatchable Unit Id:      {duid}',
+        'Daily Energy Constraint:  0',
+        'MR Offer Price Scaling Factor:  ' + ('' if isLoad else '0.0000'),
+        'Reason: 2359~P~SOC change', '',
+        DASHES, 'START OF FAST START PROFILE', DASHES]
+    lines += [f'{name}: 0' for name in bidschema.FAST_START_PROFILE['fields']]
+    lines += [DASHES, 'END OF FAST START PROFILE', '']
+    if serviceType == bidschema.ENERGY_TYPE:
+        lines += energyUnitLimits(intervals, isLoad, defect, rand)
+    else:
+        lines += fcasUnitLimits(intervals, defect, rand)
+    lines += priceBands(rand)
+    lines += bandAvailability(intervals, defect, rand)
+    lines += [DASHES, 'END OF DISPATCHABLE UNIT', DASHES, '']
+    return lines
+
+
+def energyUnitLimits(intervals, isLoad, defect, rand):
+    lines = ['START OF UNIT LIMITS', DASHES,
+        'Trading   Max Availability  ROC-UP  ROC-DOWN  Fixed PASA Availability MR Capacity',
+        'Interval  Loading',
+        '--------  ----------------  ------  --------  ----- ----------------- -----------']
+    for interval in range(1, intervals + 1):
+        maxAvail = rand.randint(100, 600)
+        pasa = maxAvail - 1 if interval == 1 and defect == 'UNIT LIMITS' else maxAvail + rand.randint(0, 50)
+        mrCapacity = '' if isLoad else '0'
+        lines.append(f'{interval:02d}        {maxAvail:<18}{rand.randint(1, 10):<8}{rand.randint(1, 10):<10}'
+            f'{"":<6}{pasa:<18}{mrCapacity}'.rstrip())
+    return lines + [DASHES, 'END OF UNIT LIMITS', '']
+
+
+def fcasUnitLimits(intervals, defect, rand):
+    lines = ['START OF UNIT LIMITS', DASHES,
+        'Trading  Max Availability Enablement Low      Enablement High',
+        'Interval Loading          Min        Break Pt Max        Break Pt']
+    for interval in range(1, intervals + 1):
+        enableMin = rand.randint(100, 300)
+        enableMax = enableMin + rand.randint(100, 300)
+        highBreak = enableMax + 1 if interval == 1 and defect == 'UNIT LIMITS' else enableMax - rand.randint(0, 50)
+        lines.append(f'{interval:02d}        {rand.randint(10, 50):<18}{enableMin:<12}{enableMin:<10}'
+            f'{enableMax:<11}{highBreak}')
+    return lines + [DASHES, 'END OF UNIT LIMITS', '']
+
+
+def priceBands(rand):
+    prices = sorted(round(rand.uniform(-1000, 15000), 2) for _ in PRICE_BANDS)
+    return ['START OF PRICE BANDS', DASHES,
+        f'{"Price Band":<12}' + ''.join(f'{band:>11}' for band in PRICE_BANDS),
+        f'{"Price($/MWh)":<12}' + ''.join(f'{price:>11.2f}' for price in prices), '',
+        DASHES, 'END OF PRICE BANDS', '']
+
+
+def bandAvailability(intervals, defect, rand):
+    lines = ['START OF BAND AVAILABILITY', DASHES, '',
+        'Trading',
+        f'{"Interval":<11}' + ''.join(f'{band:>10}' for band in PRICE_BANDS)]
+    for interval in range(1, intervals + 1):
+        values = [rand.randint(0, 300) for _ in PRICE_BANDS]
+        if interval == 1 and defect == 'BAND AVAILABILITY':
+            values[0] = 'n/a'
+        lines.append(f'{interval:02d}{"":<9}' + ''.join(f'{value:>10}' for value in values))
+    return lines + ['', DASHES, 'END OF BAND AVAILABILITY', '']
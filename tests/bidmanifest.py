@@ -0,0 +1,120 @@
+import os
+import json
+import hashlib
+import pytest
+import bidtest
+
+
+MANIFEST_VERSION = 1
+# results are only replayed while the code that produced them is unchanged
+CODE_FILES = ['test_bidFiles.py', 'bidtest.py', 'bidtable.py', 'bidschema.py']
+
+
+class BidManifest:
+    def __init__(self, fpath):
+        self.fpath = fpath
+        self.codeDigest = codeDigest()
+        self.files = {}
+        if os.path.exists(fpath):
+            with open(fpath) as f:
+                content = json.load(f)
+            if content.get('version') == MANIFEST_VERSION and content.get('codeDigest') == self.codeDigest:
+                self.files = content['files']
+
+    def fileState(self, dirPath, fname):
+        stat = os.stat(os.path.join(dirPath, fname))
+        state = {'file': fname, 'size': stat.st_size, 'mtime': stat.st_mtime_ns}
+        entry = self.files.get(fname)
+        if entry and entry['size'] == state['size'] and entry['mtime'] == state['mtime']:
+            state['digest'] = entry['digest']
+        else:
+            fileLines = bidtest.mapTextFile(os.path.join(dirPath, fname))
+            state['digest'] = fileLines.digest()
+            fileLines.close()
+        return state
+
+    def storedResult(self, state, testName):
+        entry = self.files.get(state['file'])
+        if entry and entry['digest'] == state['digest']:
+            return entry['results'].get(testName)
+        return None
+
+    def record(self, report):
+        state = report.bidReplay
+        entry = self.files.get(state['file'])
+        if not entry or entry['digest'] != state['digest']:
+            entry = {k: state[k] for k in ['size', 'mtime', 'digest']}
+            entry['results'] = {}
+            self.files[state['file']] = entry
+        entry['size'], entry['mtime'] = state['size'], state['mtime']
+        if report.when == 'call' or report.outcome != 'passed':
+            previous = entry['results'].get(state['test'])
+            if previous is None or report.when == 'setup' or previous['outcome'] == 'passed':
+                entry['results'][state['test']] = {
+                    'outcome': report.outcome,
+                    'longrepr': str(report.longrepr) if report.longrepr else None,
+                    'duration': report.duration,
+                }
+
+    def pytest_runtest_logreport(self, report):
+        if hasattr(report, 'bidReplay'):
+            self.record(report)
+
+    def pytest_sessionfinish(self, session):
+        if not hasattr(session.config, 'workerinput'):
+            self.save()
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.fpath) or '.', exist_ok=True)
+        tmpPath = self.fpath + '.tmp'
+        with open(tmpPath, 'w') as f:
+            json.dump({'version': MANIFEST_VERSION, 'codeDigest': self.codeDigest, 'files': self.files}, f)
+        os.replace(tmpPath, self.fpath)
+
+
+def codeDigest():
+    digest = hashlib.blake2b(digest_size=20)
+    testsDir = os.path.dirname(os.path.abspath(__file__))
+    for fname in CODE_FILES:
+        with open(os.path.join(testsDir, fname), 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+def markReplays(config, items):
+    if not hasattr(config, 'bidFileCache'):
+        return
+    source = config.bidFileCache.source
+    if not isinstance(source, bidtest.LocalFileSource):
+        print('--incremental needs local bid files, running all bid file tests')
+        return
+    manifest = config.bidManifest
+    states = {}
+    for item in items:
+        fname = bidtest.bidFileOf(item)
+        if fname is None:
+            continue
+        if fname not in states:
+            states[fname] = manifest.fileState(source.dirPath, fname)
+        state = dict(states[fname], test=item.originalname)
+        item.bidReplay = state
+        stored = manifest.storedResult(state, item.originalname)
+        if stored and stored['outcome'] != 'skipped' and not item.get_closest_marker('noreplay'):
+            item.bidReplayResult = stored
+
+
+def replay(item):
+    stored = item.bidReplayResult
+    item.ihook.pytest_runtest_logstart(nodeid=item.nodeid, location=item.location)
+    for when in ['setup', 'call', 'teardown']:
+        isCall = when == 'call'
+        report = pytest.TestReport(
+            item.nodeid, item.location, {k: 1 for k in item.keywords},
+            stored['outcome'] if isCall else 'passed',
+            stored['longrepr'] if isCall else None,
+            when,
+            sections=[('Captured stdout call', 'replayed from bid manifest\n')] if isCall else [],
+            duration=stored['duration'] if isCall else 0)
+        report.bidReplay = item.bidReplay
+        item.ihook.pytest_runtest_logreport(report=report)
+    item.ihook.pytest_runtest_logfinish(nodeid=item.nodeid, location=item.location)
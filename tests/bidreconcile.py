@@ -0,0 +1,93 @@
+import os
+import datetime
+import bidschema
+import bidtable
+
+
+TRADING_INTERVAL = ('Trading', 'Interval')
+MAX_AVAILABILITY = ('Max Availability', 'Loading')
+MR_CAPACITY = ('MR Capacity', '')
+TRADING_DATE_FMT = '%d/%m/%Y'
+
+
+def collectUnitLimits(bidFileCache, settleDate, fnames=None):
+    # (duid, serviceType, interval) -> (maxAvailability, mrCapacity) of all valid bids for settleDate,
+    # files are read in version order so a later version replaces the values of an earlier one
+    bidValues = {}
+    skipped = []
+    for fname in byVersion(fnames if fnames is not None else bidFileCache.source.fnames):
+        doc = bidFileCache.get(fname)  # reuses a document a test still holds, release keeps it open for it
+        try:
+            if bidschema.validate(doc):
+                skipped.append(fname)
+                continue
+            for (tradeDate, *key), values in unitLimitsOf(doc):
+                if tradeDate == settleDate:
+                    bidValues[tuple(key)] = values
+        finally:
+            bidFileCache.release(fname)
+    return bidValues, skipped
+
+
+def byVersion(fnames):
+    return sorted(fnames, key=lambda fname: versionOf(fname) + (fname,))
+
+
+def versionOf(fname):
+    # (date, version) of names ending in "_YYYYMMDD_NNN", see bidgen.bidFileName,
+    # versions restart every day so the date orders first
+    parts = os.path.splitext(fname)[0].split('_')
+    version = int(parts[-1]) if parts[-1].isdigit() else -1
+    date = parts[-2] if len(parts) > 1 and len(parts[-2]) == 8 and parts[-2].isdigit() else ''
+    return date, version
+
+
+def unitLimitsOf(doc):
+    errCtx = f'file={doc.fname}'
+    for bid in doc.sections('BID'):
+        serviceType = bid.field('Service Type', errCtx)
+        tradeDate = datetime.datetime.strptime(bid.field('Trading Date', errCtx), TRADING_DATE_FMT).date()
+        for unit in bid.sections('DISPATCHABLE UNIT'):
+            duid = unit.field('Dispatchable Unit Id', errCtx)
+            for limits in unit.sections('UNIT LIMITS'):
+                table = unitLimitsTable(limits, serviceType)
+                intervals = table[TRADING_INTERVAL].ints.tolist()
+                maxAvail = table[MAX_AVAILABILITY].ints.tolist()
+                mrCapacity = [None] * table.rowCount
+                if MR_CAPACITY in table.columns:
+                    column = table[MR_CAPACITY]
+                    mrCapacity = [int(v) if ok else None for v, ok in zip(column.ints.tolist(), column.isPosInt)]
+                for interval, values in zip(intervals, zip(maxAvail, mrCapacity)):
+                    yield (tradeDate, duid, serviceType, interval), values
+
+
+def unitLimitsTable(section, serviceType):
+    # same table layout the schema validated, see bidschema.UNIT_LIMITS
+    variants = bidschema.UNIT_LIMITS['variants'][1]
+    spec = variants.get(serviceType, variants[None])['table']
+    prefixes = spec['headerPrefixes']
+    headerIdx = next(i for i, ln in enumerate(section.lines) if ln.startswith(prefixes[0]))
+    dataIdxs = [i for i, ln in enumerate(section.lines) if not ln.startswith(tuple(prefixes))]
+    colPositions = bidtable.findColumnPositions(section.lines[headerIdx], spec['headers'])
+    return bidtable.FixedWidthTable([section.lines[i] for i in dataIdxs], colPositions,
+        [section.lineNos[i] for i in dataIdxs])
+
+
+def reconcile(bidValues, dbRows):
+    # dbRows are (duid, serviceType, interval, maxAvailability, mrCapacity), joined with bidValues in memory
+    missing = dict(bidValues)
+    unexpected = []
+    mismatched = []
+    for duid, serviceType, interval, maxAvail, mrCapacity in dbRows:
+        key = (duid, serviceType, int(interval))
+        dbValues = (toInt(maxAvail), toInt(mrCapacity))
+        bidValue = missing.pop(key, None)
+        if bidValue is None:
+            unexpected.append(key)
+        elif bidValue != dbValues:
+            mismatched.append((key, bidValue, dbValues))
+    return {'missing': sorted(missing), 'unexpected': sorted(unexpected), 'mismatched': sorted(mismatched)}
+
+
+def toInt(value):
+    return None if value is None or value == '' else int(value)
@@ -0,0 +1,546 @@
+import re
+import os
+import datetime
+from collections import namedtuple
+import numpy as np
+import bidtable
+import bidtest
+
+
+ENERGY_TYPE = 'ENERGY'
+SERVICE_TYPES = {
+    'RAISE6SEC':  ['BATTGENID'],
+    'RAISE60SEC': ['BATTGENID'],
+    'RAISE5MIN':  ['BATTGENID'],
+    ENERGY_TYPE:  ['BATTGENID', 'BATTLOADID'],
+    'LOWER6SEC':  ['BATTLOADID'],
+    'LOWER60SEC': ['BATTLOADID'],
+    'LOWER5MIN':  ['BATTLOADID'],
+}
+BID_REASON_CODES = [
+    'COMMS FAULT',
+    'BATTERY IN ISLANDING STATE',
+    'LOCAL LIMIT CHANGE',
+    'LOCAL LIMIT CHANGE',
+    'CHANGE IN LOCAL MIN REQUIREMENT',
+    'SOC CHANGE',
+    'CHANGE IN AEMO DISPATCH 30/5 SETTLEMENT',
+    '010 UNEXPECTED/PLANT LIMITS',
+]
+STRUCTURE_GROUP = 'sections'
+FILENAME_GROUP = 'filename'
+FIRST_LINE_GROUP = 'first line'
+FILENAME_MAX_LEN = 40
+FIRST_AUTO_BID_VERSION = 2
+
+Violation = namedtuple('Violation', 'group path lineNo message')
+
+
+# --- Field rules: return an error message or None ---
+
+
+def equals(expected):
+    def check(value):
+        if str(value) != expected:
+            return f'expected "{expected}" but found "{value}"'
+    return check
+
+
+def floatEquals(expected, rel=0.1):
+    def check(value):
+        try:
+            ok = abs(float(value) - expected) <= abs(expected) * rel
+        except ValueError:
+            ok = False
+        if not ok:
+            return f'expected about {expected} but found "{value}"'
+    return check
+
+
+def lenMax(maxLen):
+    def check(value):
+        if len(value) > maxLen:
+            return f'expected at most {maxLen} characters in "{value}"'
+    return check
+
+
+def digits(minLen, maxLen):
+    def check(value):
+        if not (str(value).isnumeric() and minLen <= len(value) <= maxLen):
+            return f'expected {minLen}-{maxLen} digits in "{value}"'
+    return check
+
+
+def alphaNumeric():
+    def check(value):
+        if not str(value).isalnum():
+            return f'expected alphanumeric value but found "{value}"'
+    return check
+
+
+def posInt():
+    def check(value):
+        if not value.isdigit():
+            return f'expected positive int but found "{value}"'
+    return check
+
+
+def decimals(count, negativeOk=False):
+    reAbs = r"\d+(?:\.\d{1," + str(count) + "})?"
+    pattern = re.compile(f"^-?{reAbs}$" if negativeOk else f"^{reAbs}$")
+
+    def check(value):
+        if not pattern.match(value):
+            return f'value="{value}": expected a float with up to {count} decimals, negativeOk={negativeOk}'
+    return check
+
+
+def dateFmt(fmt):
+    def check(value):
+        try:
+            datetime.datetime.strptime(value, fmt)
+        except ValueError:
+            return f'date="{value}" should be in {fmt} format'
+    return check
+
+
+def oneOf(allowed, what):
+    def check(value):
+        if value not in allowed:
+            return f'"{value}" is not one of allowed {what}={list(allowed)}'
+    return check
+
+
+def reasonFmt():
+    sep = '~'
+    entities = ['A', 'P']
+
+    def check(value):
+        parts = value.split(sep)
+        if len(parts) < 3:
+            return f'expected 3 parts separated by "{sep}" in "{value}"'
+        time, entity, code = parts[:3]
+        if not (len(time) == 4 and time.isdigit()):
+            return f'expected "hhmm" format in time part="{time}"'
+        if int(time) > 2400:
+            return f'expected 0000-2400 in "hhmm" format in time part="{time}"'
+        if int(time[2:]) > 59:
+            return f'expected 00-59 minutes in "hhmm" format in time part="{time}"'
+        if entity not in entities:
+            return f'expected entity={entity} to be in allowed={entities}'
+        if code.upper() not in BID_REASON_CODES:
+            return f'expected code="{code}" to be in allowed={BID_REASON_CODES}'
+    return check
+
+
+# --- Table rules: column rules return a mask of offending rows ---
+
+
+def posIntColumn():
+    return (lambda column: ~column.isPosInt), 'expected positive int'
+
+
+def decimalsColumn(count, negativeOk=False):
+    return (lambda column: ~column.isDecimals(count, negativeOk)), f'expected a float with up to {count} decimals'
+
+
+def tradeIntervals(header):
+    def rule(table, walk, failRows):
+        column = table[header]
+        wellFormed = column.isPosInt & (np.char.str_len(column.cells) == 2)
+        failRows(~wellFormed, 'expected 2 digits in trading interval')
+        failRows(wellFormed & ((column.ints < 1) | (column.ints > 48)), 'trading interval outside of range 01-48')
+        outOfOrder = np.concatenate([[False], np.diff(column.ints) <= 0])
+        failRows(wellFormed & outOfOrder, 'expected unique trading intervals in consecutive order')
+    return rule
+
+
+def energyUnitLimits(table, walk, failRows):
+    maxAvail = table[('Max Availability', 'Loading')]
+    rocDown = table[('ROC-DOWN', '')]
+    fixed = table[('Fixed', '')]
+    pasaAvail = table[('PASA Availability', '')]
+    mrCapacity = table[('MR Capacity', '')]
+
+    failRows(pasaAvail.isPosInt & maxAvail.isPosInt & (pasaAvail.ints < maxAvail.ints),
+        "'PASA Availability' should be no less than 'Max Avail. Loading'")
+
+    failRows(~fixed.blank & ~fixed.isPosInt, 'column=Fixed: expected positive int')
+    failRows(fixed.isPosInt & maxAvail.isPosInt & (fixed.ints > maxAvail.ints),
+        'Fixed cannot be greater than "Max Availability Loading"')
+
+    if walk.lookup('MR Offer Price Scaling Factor'):
+        failRows(~mrCapacity.isPosInt, 'column="MR Capacity": expected positive int')
+    else:
+        failRows(~mrCapacity.blank, 'MR Capacity expected blank if MR Offer is blank')
+
+    mrPositive = mrCapacity.isPosInt & (mrCapacity.ints > 0)
+    failRows(mrPositive & (fixed.cells != '0'),
+        'If the MR Capacity is an integer > 0 then Fixed must be zero or blank')
+    failRows(mrCapacity.isPosInt & maxAvail.isPosInt & (mrCapacity.ints > maxAvail.ints),
+        '"MR Capacity" should not be greater than "Max Availability Loading"')
+    failRows(mrCapacity.isPosInt & rocDown.isPosInt & (mrCapacity.ints > rocDown.ints * 30),
+        '"MR Capacity" cannot be greater than 30 times ROC-DOWN')
+
+
+def fcasUnitLimits(table, walk, failRows):
+    highBreak = table[('High', 'Break Pt')]
+    enableMax = table[('Enablement', 'Max')]
+    failRows(highBreak.isPosInt & enableMax.isPosInt & (highBreak.ints > enableMax.ints),
+        "'High Break Pt' must not exceed Enablement Max")
+
+
+# --- Section checks: cross-field rules reporting through walk.fail ---
+
+
+def versionMatchesFilename(section, walk):
+    for value, lineNo in section.fieldEntries('Version No'):
+        verFName = os.path.splitext(walk.doc.fname)[0].split('_')[-1]
+        if value.isdigit() and verFName.isdigit() and int(value) != int(verFName):
+            walk.fail('BID FILE', lineNo, f'field=Version No: {value} does not match Filename')
+
+
+def duidRegistered(section, walk):
+    serviceType = walk.lookup('Service Type')
+    for duid, lineNo in section.fieldEntries('Dispatchable Unit Id'):
+        if serviceType in SERVICE_TYPES and duid not in SERVICE_TYPES[serviceType]:
+            walk.fail('DUID serviceType', lineNo, f'duid={duid} is not registered for serviceType={serviceType}')
+
+
+def fileNameFormat(section, walk):
+    error = fileNameError(walk.doc.fname)
+    if error:
+        walk.fail(FILENAME_GROUP, 0, error)
+
+
+def fileNameError(fname):
+    if len(fname) > FILENAME_MAX_LEN:
+        return 'is too long'
+    nameParts = os.path.splitext(fname)[0].split('_')
+    if len(nameParts) != 4:
+        return 'must have 4 parts'
+    participant, bidType, dateStr, version = nameParts
+    if len(participant) == 0:
+        return 'must contain a participant'
+    if 'OFFER' not in bidType:
+        return 'must contain "OFFER"'
+    if not (version.isnumeric() and len(version) == 3):
+        return 'must have 3 digit version'
+    if int(version) < FIRST_AUTO_BID_VERSION:
+        return f'version must start with {FIRST_AUTO_BID_VERSION} for auto bids'
+    error = dateFmt('%Y%m%d')(dateStr)
+    if error:
+        return 'part ' + error
+
+
+def firstLineComment(section, walk):
+    fileLines = walk.doc.fileLines
+    if len(fileLines) == 0:
+        walk.fail(FIRST_LINE_GROUP, 1, 'is empty')
+    elif not bidtest.isBidComment(fileLines[0]):
+        walk.fail(FIRST_LINE_GROUP, 1, f'expected a comment but found "{fileLines[0]}"')
+
+
+def requireSomewhere(name):
+    def check(section, walk):
+        if not section.sections(name):
+            walk.fail(name, section.lineNo, f'expected 1 or more {name} sections but found 0')
+    return check
+
+
+# --- Bid file schema ---
+
+
+UNIT_LIMITS_TABLE = {
+    'headerPrefixes': ['Trading ', 'Interval '],
+    'rows': 48,
+}
+FAST_START_PROFILE = {
+    'count': (0, 1),
+    'fields': {
+        'Fast Start Min Load': posInt(),
+        'FS Time at Zero (T1)': posInt(),
+        'FS Time to Min Load (T2)': posInt(),
+        'FS Time at Min Load (T3)': posInt(),
+        'FS Time to zero (T4)': posInt(),
+    },
+}
+UNIT_LIMITS = {
+    'count': (1, None),
+    'variants': ('Service Type', {
+        ENERGY_TYPE: {'table': dict(UNIT_LIMITS_TABLE,
+            headers=[
+                ('Trading', 'Interval'),
+                ('Max Availability', 'Loading'),
+                ('ROC-UP', ''),
+                ('ROC-DOWN', ''),
+                ('Fixed', ''),
+                ('PASA Availability', ''),
+                ('MR Capacity', '')],
+            columns={
+                ('Max Availability', 'Loading'): posIntColumn(),
+                ('ROC-UP', ''): posIntColumn(),
+                ('ROC-DOWN', ''): posIntColumn(),
+                ('PASA Availability', ''): posIntColumn()},
+            rules=[tradeIntervals(('Trading', 'Interval')), energyUnitLimits])},
+        None: {'table': dict(UNIT_LIMITS_TABLE,
+            headers=[
+                ('Trading', 'Interval'),
+                ('Max Availability', 'Loading'),
+                ('Enablement', 'Min'),
+                ('Low', 'Break Pt'),
+                ('Enablement', 'Max'),
+                ('High', 'Break Pt')],
+            columns={
+                ('Max Availability', 'Loading'): posIntColumn(),
+                ('Enablement', 'Min'): posIntColumn(),
+                ('Low', 'Break Pt'): posIntColumn(),
+                ('Enablement', 'Max'): posIntColumn(),
+                ('High', 'Break Pt'): posIntColumn()},
+            rules=[tradeIntervals(('Trading', 'Interval')), fcasUnitLimits])},
+    }),
+}
+PRICE_BANDS = {
+    'count': (1, None),
+    'table': {
+        'headerPrefixes': ['Price Band '],
+        'headers': ['Price Band', 'PB1', 'PB2', 'PB3', 'PB4', 'PB5', 'PB6', 'PB7', 'PB8', 'PB9', 'PB10'],
+        'rightAligned': True,
+        'dataPrefix': 'Price($/MWh)',
+        'rows': 1,
+        'columns': {f'PB{i}': decimalsColumn(2, negativeOk=True) for i in range(1, 11)},
+    },
+}
+BAND_AVAILABILITY = {
+    'count': (1, None),
+    'table': {
+        'headerPrefixes': ['Trading', 'Interval '],
+        'headers': ['Interval', 'PB1', 'PB2', 'PB3', 'PB4', 'PB5', 'PB6', 'PB7', 'PB8', 'PB9', 'PB10'],
+        'rightAligned': True,
+        'rows': 48,
+        'columns': {f'PB{i}': posIntColumn() for i in range(1, 11)},
+        'rules': [tradeIntervals('Interval')],
+    },
+}
+DISPATCHABLE_UNIT = {
+    'count': (1, None),
+    'fields': {
+        'Dispatchable Unit Id': alphaNumeric(),
+        'Reason': reasonFmt(),
+    },
+    'variants': ('Dispatchable Unit Id', {
+        'BATTLOADID': {'optionalFields': {
+            'Daily Energy Constraint': posInt(),
+            'MR Offer Price Scaling Factor': equals(''),
+        }},
+        None: {'optionalFields': {
+            'Daily Energy Constraint': posInt(),
+            'MR Offer Price Scaling Factor': decimals(4),
+        }},
+    }),
+    'checks': [duidRegistered],
+    'sections': {
+        'FAST START PROFILE': FAST_START_PROFILE,
+        'UNIT LIMITS': UNIT_LIMITS,
+        'PRICE BANDS': PRICE_BANDS,
+        'BAND AVAILABILITY': BAND_AVAILABILITY,
+    },
+}
+BID_SCHEMA = {
+    'group': STRUCTURE_GROUP,
+    'checks': [fileNameFormat, firstLineComment, requireSomewhere('FAST START PROFILE')],
+    'sections': {
+        'BID FILE': {
+            'count': (1, 1),
+            'fields': {
+                'To': equals('AEMO'),
+                'From': equals('BATTSITE'),
+                'Issued on': dateFmt('%d/%m/%Y %H:%M'),
+                'Version No': digits(1, 3),
+                'Authorised by': equals('AUTOBID'),
+            },
+            'checks': [versionMatchesFilename],
+            'sections': {
+                'BID': {
+                    'count': (1, None),
+                    'fields': {
+                        'Service Type': oneOf(SERVICE_TYPES.keys(), 'Service Types'),
+                        'Trading Date': dateFmt('%d/%m/%Y'),
+                    },
+                    'sections': {
+                        'DISPATCHABLE UNIT': DISPATCHABLE_UNIT,
+                    },
+                },
+            },
+        },
+    },
+}
+
+
+# --- Schema engine ---
+
+
+class _Walk:
+    def __init__(self, doc):
+        self.doc = doc
+        self.stack = []
+        self.violations = []
+
+    def lookup(self, name):
+        for section in reversed(self.stack):
+            entries = section.fieldEntries(name)
+            if entries:
+                value, _ = entries[0]
+                return value
+        return None
+
+    def fail(self, group, lineNo, message):
+        path = '/'.join(s.name for s in self.stack if s.name)
+        self.violations.append(Violation(group, path, lineNo, message))
+
+
+class SectionValidator:
+    def __init__(self, name, spec):
+        self.name = name
+        self.group = spec.get('group', name)
+        self.count = spec.get('count', (0, None))
+        self.fields = list(spec.get('fields', {}).items())
+        self.optionalFields = list(spec.get('optionalFields', {}).items())
+        self.checks = spec.get('checks', [])
+        self.table = TableValidator(spec['table']) if 'table' in spec else None
+        self.children = {childName: SectionValidator(childName, childSpec)
+            for childName, childSpec in spec.get('sections', {}).items()}
+        self.variantField, variants = spec.get('variants', (None, {}))
+        baseSpec = {k: v for k, v in spec.items() if k != 'variants'}
+        self.variants = {key: SectionValidator(name, dict(baseSpec, **variantSpec))
+            for key, variantSpec in variants.items()}
+
+    def validate(self, section, walk):
+        walk.stack.append(section)
+        validator = self
+        if self.variantField:
+            key = walk.lookup(self.variantField)
+            validator = self.variants.get(key, self.variants.get(None, self))
+        validator._validateSection(section, walk)
+        walk.stack.pop()
+
+    def _validateSection(self, section, walk):
+        for name, rule in self.fields:
+            self._checkField(section, name, rule, walk, self.group, optional=False)
+        for name, rule in self.optionalFields:
+            self._checkField(section, name, rule, walk, self.group + ' optional', optional=True)
+        for check in self.checks:
+            check(section, walk)
+        if self.table:
+            self.table.validate(section, walk, self.group)
+        self._validateChildren(section, walk)
+
+    def _checkField(self, section, name, rule, walk, group, optional):
+        entries = section.fieldEntries(name)
+        if optional and len(entries) == 0:
+            return
+        if len(entries) != 1:
+            lineNo = entries[1][1] if entries else section.lineNo
+            walk.fail(group, lineNo, f'expected exactly 1 field="{name}" but found {len(entries)}')
+            return
+        value, lineNo = entries[0]
+        if optional and not value:
+            return
+        error = rule(value)
+        if error:
+            walk.fail(group, lineNo, f'field="{name}": {error}')
+
+    def _validateChildren(self, section, walk):
+        counts = {}
+        for child in section.children:
+            validator = self.children.get(child.name)
+            if validator is None:
+                walk.fail(STRUCTURE_GROUP, child.lineNo,
+                    f'unexpected sub-section "{child.name}", expected within={list(self.children)}')
+                continue
+            counts[child.name] = counts.get(child.name, 0) + 1
+            validator.validate(child, walk)
+        for name, validator in self.children.items():
+            low, high = validator.count
+            found = counts.get(name, 0)
+            if found < low or (high is not None and found > high):
+                walk.fail(self.group, section.lineNo,
+                    f'expected {describeCount(low, high)} {name} sections but found {found}')
+
+
+class TableValidator:
+    def __init__(self, spec):
+        self.headerPrefixes = spec['headerPrefixes']
+        self.headers = spec['headers']
+        self.rightAligned = spec.get('rightAligned', False)
+        self.dataPrefix = spec.get('dataPrefix')
+        self.rows = spec['rows']
+        self.columns = list(spec.get('columns', {}).items())
+        self.rules = spec.get('rules', [])
+
+    def validate(self, section, walk, group):
+        lines = section.lines
+        headerIdxs = []
+        for prefix in self.headerPrefixes:
+            matches = [i for i, ln in enumerate(lines) if ln.startswith(prefix)]
+            if len(matches) != 1:
+                walk.fail(group, section.lineNo, f'expected 1 table header "{prefix}" but found {len(matches)}')
+                return
+            headerIdxs.extend(matches)
+
+        if self.dataPrefix:
+            dataIdxs = [i for i, ln in enumerate(lines) if ln.startswith(self.dataPrefix)]
+        else:
+            dataIdxs = [i for i in range(len(lines)) if i not in headerIdxs]
+        if len(dataIdxs) != self.rows:
+            walk.fail(group, section.lineNo, f'expected {self.rows} table data rows but found {len(dataIdxs)}')
+            return
+        dataLines = [lines[i] for i in dataIdxs]
+
+        headerIdx = headerIdxs[-1] if self.rightAligned else headerIdxs[0]
+        headerLine = lines[headerIdx]
+        if self.rightAligned:
+            found = re.split(r'\s\s+', headerLine.strip())
+            if found != self.headers:
+                walk.fail(group, section.lineNos[headerIdx], f'expected column headers {self.headers} but found {found}')
+                return
+            colPositions = bidtable.findRightAlignedPositions(headerLine, self.headers, dataLines)
+        else:
+            colPositions = bidtable.findColumnPositions(headerLine, self.headers)
+            if any(pos < 0 for _, pos in colPositions):
+                walk.fail(group, section.lineNos[headerIdx], f'some column headers not found {colPositions}')
+                return
+
+        table = bidtable.FixedWidthTable(dataLines, colPositions, [section.lineNos[i] for i in dataIdxs])
+
+        def failRows(mask, message):
+            for key, lineNo in table.rows(mask):
+                walk.fail(group, lineNo, f'row={key}: {message}')
+
+        for header, (invalid, message) in self.columns:
+            failRows(invalid(table[header]), f'column={header}: {message}')
+        for rule in self.rules:
+            rule(table, walk, failRows)
+
+
+def describeCount(low, high):
+    if low == high:
+        return f'exactly {low}'
+    if high is None:
+        return f'{low} or more'
+    return f'{low} to {high}'
+
+
+def compileSchema(schema):
+    return SectionValidator(None, schema)
+
+
+BID_VALIDATOR = compileSchema(BID_SCHEMA)
+
+
+def validate(doc, validator=BID_VALIDATOR):
+    walk = _Walk(doc)
+    for lineNo, message in doc.errors:
+        walk.fail(STRUCTURE_GROUP, lineNo, message)
+    validator.validate(doc, walk)
+    return walk.violations
@@ -0,0 +1,72 @@
+import numpy as np
+
+
+MAX_INT_DIGITS = 18  # fits int64
+
+
+class TableColumn:
+    def __init__(self, cells):
+        self.cells = np.char.strip(cells)
+        self.blank = self.cells == ''
+        self.isPosInt = np.char.isdigit(self.cells) & (np.char.str_len(self.cells) <= MAX_INT_DIGITS)
+        self.ints = np.where(self.isPosInt, self.cells, '0').astype(np.int64)
+
+    def isDecimals(self, count, negativeOk=False):
+        cells = self.cells
+        if negativeOk:
+            before, minus, after = np.rollaxis(np.char.partition(cells, '-'), -1)
+            cells = np.where((before == '') & (minus == '-'), after, cells)
+        whole, dot, fraction = np.rollaxis(np.char.partition(cells, '.'), -1)
+        fractionOk = np.char.isdigit(fraction) & (np.char.str_len(fraction) <= count)
+        return np.char.isdigit(whole) & ((dot == '') | fractionOk)
+
+    def texts(self, mask=None):
+        cells = self.cells if mask is None else self.cells[mask]
+        return [str(c) for c in cells]
+
+
+class FixedWidthTable:
+    def __init__(self, dataLines, colPositions, lineNos=None):
+        self.rowCount = len(dataLines)
+        self.lineNos = np.array(lineNos if lineNos is not None else range(1, self.rowCount + 1), dtype=np.int64)
+        starts = [pos for _, pos in colPositions]
+        width = max([len(ln) for ln in dataLines] + starts) + 1
+        # one fixed-width char matrix for the whole section, columns are sliced out of it
+        chars = np.array(dataLines, dtype=f'U{width}').view('U1').reshape(self.rowCount, width)
+        ends = starts[1:] + [width]
+        self.headers = [header for header, _ in colPositions]
+        self.columns = {}
+        for header, start, end in zip(self.headers, starts, ends):
+            end = max(end, start + 1)
+            cells = np.ascontiguousarray(chars[:, start:end]).view(f'U{end - start}').reshape(self.rowCount)
+            self.columns[header] = TableColumn(cells)
+
+    def __getitem__(self, header):
+        return self.columns[header]
+
+    def rowKeys(self, mask):
+        return self.columns[self.headers[0]].texts(mask)
+
+    def rows(self, mask):
+        return list(zip(self.rowKeys(mask), self.lineNos[mask].tolist()))
+
+
+def findColumnPositions(line, headers):
+    positions = []
+    idx = 0
+    for header in headers:
+        idx = line.find(header[0], idx)
+        positions.append((header, idx))
+    return positions
+
+
+def findRightAlignedPositions(line, headers, dataLines):
+    ends = []
+    idx = 0
+    for header in headers:
+        idx = line.find(header, idx) + len(header)
+        ends.append(idx)
+    # row labels are left aligned and may be wider than their header
+    keyWidth = max([len(ln.split()[0]) for ln in dataLines if ln.strip()] + [ends[0]])
+    starts = [0, keyWidth] + ends[1:-1]
+    return list(zip(headers, starts))
@@ -0,0 +1,438 @@
+import os
+import mmap
+import pickle
+import hashlib
+import datetime
+import threading
+from array import array
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import anytest
+import azuretest
+
+
+SECTION_PREFIX_START = 'START OF '
+SECTION_PREFIX_END = 'END OF '
+STORAGE_PREFIX = 'STORAGE_LOCATION='
+WORKER_FILES_DIR = 'bidFilesDir'  # workerinput key of the dir the xdist controller synced
+BID_FILE_TESTS = 'test_bidFiles.py'  # module parametrized by bidFile
+PARSER_VERSION = 1  # bump when parsing changes, persisted parse cache entries of other versions are dropped
+
+
+def isBidComment(line):
+    return line.startswith('-') or len(line) == 0 or line.isspace()
+
+
+class BidSection:
+    def __init__(self, name, lineNo):
+        self.name = name
+        self.lineNo = lineNo
+        self.lines = []  # own body lines, nested sections excluded
+        self.lineNos = []
+        self.children = []
+        self._fields = {}
+        self._sectionsByName = {}  # all nested sections at any depth
+
+    def sections(self, name):
+        return self._sectionsByName.get(name, [])
+
+    def sectionNames(self):
+        return list(self._sectionsByName.keys())
+
+    def field(self, name, errCtx, optional=False):
+        entries = self.fieldEntries(name)
+        if optional and len(entries) == 0:
+            return None
+        assert len(entries) == 1, errCtx + f': expected exactly 1 field="{name}" but found {len(entries)}'
+        value, _ = entries[0]
+        return value
+
+    def fieldEntries(self, name):
+        return self._fields.get(name, [])
+
+    def _addLine(self, line, lineNo):
+        self.lines.append(line)
+        self.lineNos.append(lineNo)
+        label, sep, value = line.partition(':')
+        if sep:
+            self._fields.setdefault(label, []).append((value.strip(), lineNo))
+
+
+class BidDocument(BidSection):
+    def __init__(self, fname, fileLines):
+        super().__init__(None, 0)
+        self.fname = fname
+        self.fileLines = fileLines
+        self.errors = []
+        self._parse(fileLines)
+
+    def close(self):
+        self.fileLines.close()
+
+    def attach(self, fname, fileLines):
+        self.fname = fname
+        self.fileLines = fileLines
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['fname'] = None
+        state['fileLines'] = None
+        return state
+
+    def _parse(self, lines):
+        stack = [self]
+        for lineNo, line in enumerate(lines, 1):
+            if isBidComment(line):
+                continue
+            if line.startswith(SECTION_PREFIX_START):
+                section = BidSection(line[len(SECTION_PREFIX_START):], lineNo)
+                stack[-1].children.append(section)
+                for ancestor in stack:
+                    ancestor._sectionsByName.setdefault(section.name, []).append(section)
+                stack.append(section)
+            elif line.startswith(SECTION_PREFIX_END):
+                self._closeSection(stack, line[len(SECTION_PREFIX_END):], lineNo)
+            else:
+                stack[-1]._addLine(line, lineNo)
+        for section in stack[1:]:
+            self.errors.append((section.lineNo, f'unclosed section "{section.name}"'))
+
+    def _closeSection(self, stack, name, lineNo):
+        openNames = [s.name for s in stack[1:]]
+        if openNames and openNames[-1] == name:
+            stack.pop()
+        elif name in openNames:
+            while stack[-1].name != name:
+                unclosed = stack.pop()
+                self.errors.append((lineNo, f'section "{unclosed.name}" not closed before "END OF {name}"'))
+            stack.pop()
+        else:
+            self.errors.append((lineNo, f'"END OF {name}" does not match any open section'))
+
+
+class MappedLines:
+    def __init__(self, buffer, encoding='utf-8', size=None):
+        self._buffer = buffer
+        self._encoding = encoding
+        self._size = len(buffer) if size is None else size  # a pooled buffer may be larger than its content
+        self._ends = findLineEnds(buffer, self._size)
+
+    def __len__(self):
+        return len(self._ends)
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            return [self[i] for i in range(*idx.indices(len(self)))]
+        if idx < 0:
+            idx += len(self)
+        start = self._ends[idx - 1] + 1 if idx > 0 else 0
+        line = self._buffer[start:self._ends[idx]]
+        if line.endswith(b'\r'):
+            line = line[:-1]
+        return line.decode(self._encoding, 'replace')
+
+    def __iter__(self):
+        for idx in range(len(self)):
+            yield self[idx]
+
+    def digest(self):
+        with memoryview(self._buffer) as view, view[:self._size] as content:
+            return hashlib.blake2b(content, digest_size=20).hexdigest()
+
+    def close(self):
+        if isinstance(self._buffer, mmap.mmap):
+            self._buffer.close()
+
+
+class PooledLines(MappedLines):
+    def __init__(self, buffer, size, pool):
+        super().__init__(buffer, size=size)
+        self._pool = pool
+
+    def close(self):
+        if self._pool:
+            self._pool.release(self._buffer)
+            self._pool = None
+
+
+class BufferPool:
+    # anonymous memory maps reused for streamed files, returned when the file's lines are closed
+    def __init__(self, chunkSize=64 * 1024):
+        self.chunkSize = chunkSize
+        self._free = []
+        self._lock = threading.Lock()
+
+    def acquire(self, size):
+        with self._lock:
+            for buffer in self._free:
+                if len(buffer) >= size:
+                    self._free.remove(buffer)
+                    return buffer
+            if self._free:
+                self._free.pop().close()  # too small for this file, make room for a larger one
+        chunks = max(1, -(-size // self.chunkSize))
+        return mmap.mmap(-1, chunks * self.chunkSize)
+
+    def release(self, buffer):
+        with self._lock:
+            self._free.append(buffer)
+
+
+def findLineEnds(buffer, size=None):
+    size = len(buffer) if size is None else size
+    ends = array('q')
+    pos = buffer.find(b'\n', 0, size)
+    while pos >= 0:
+        ends.append(pos)
+        pos = buffer.find(b'\n', pos + 1, size)
+    if size > 0 and (len(ends) == 0 or ends[-1] != size - 1):
+        ends.append(size)
+    return ends
+
+
+def mapTextFile(fpath, verbose=True):
+    with open(fpath, 'rb') as f:
+        if verbose:
+            print(f"mapping {fpath}")
+        if os.fstat(f.fileno()).st_size == 0:
+            return MappedLines(b'')
+        return MappedLines(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+
+
+class BidParseCache:
+    def __init__(self, dirPath, maxBytes):
+        self.dirPath = dirPath
+        self.maxBytes = maxBytes
+        self.prefix = f'v{PARSER_VERSION}-'
+        self.totalBytes = 0
+        self._entries = OrderedDict()  # least recently used first
+        os.makedirs(dirPath, exist_ok=True)
+        for entry in sorted(os.scandir(dirPath), key=lambda e: e.stat().st_mtime):
+            if entry.name.endswith('.tmp'):
+                continue
+            if entry.name.startswith(self.prefix):
+                self._entries[entry.name] = entry.stat().st_size
+                self.totalBytes += entry.stat().st_size
+            else:
+                self._remove(entry.name)
+
+    def load(self, fname, fileLines):
+        name = f'{self.prefix}{fileLines.digest()}.pickle'
+        fpath = os.path.join(self.dirPath, name)
+        try:
+            with open(fpath, 'rb') as f:
+                doc = pickle.load(f)
+            os.utime(fpath)
+        except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError):
+            # missing, corrupt or naming classes that were renamed or moved since, parsed again and replaced
+            doc = BidDocument(fname, fileLines)
+            self._store(name, doc)
+            return doc
+        if name in self._entries:
+            self._entries.move_to_end(name)
+        doc.attach(fname, fileLines)
+        return doc
+
+    def _store(self, name, doc):
+        fpath = os.path.join(self.dirPath, name)
+        tmpPath = f'{fpath}.{os.getpid()}.tmp'
+        with open(tmpPath, 'wb') as f:
+            pickle.dump(doc, f, pickle.HIGHEST_PROTOCOL)
+        os.replace(tmpPath, fpath)  # atomic, parallel workers may store the same entry
+        size = os.path.getsize(fpath)
+        self.totalBytes += size - self._entries.pop(name, 0)
+        self._entries[name] = size
+        while self.totalBytes > self.maxBytes and len(self._entries) > 1:
+            evicted, evictedSize = self._entries.popitem(last=False)
+            self.totalBytes -= evictedSize
+            self._remove(evicted)
+
+    def _remove(self, name):
+        try:
+            os.remove(os.path.join(self.dirPath, name))
+        except OSError:
+            pass
+
+
+class LocalFileSource:
+    def __init__(self, dirPath):
+        self.dirPath = dirPath
+        self.fnames = anytest.findTextFiles(dirPath)
+
+    def listAll(self):
+        return os.listdir(self.dirPath)
+
+    def open(self, fname):
+        return mapTextFile(os.path.join(self.dirPath, fname))
+
+    def prefetch(self, fname):
+        pass
+
+
+class StorageStreamSource:
+    # reads stored files into pooled memory buffers, no local copy unless saveDir is given
+    def __init__(self, fs, storageLoc, sourceDir, saveDir=None):
+        self.fs = fs
+        self.storageLoc = storageLoc
+        self.sourceDir = sourceDir
+        self.saveDir = saveDir
+        self.sizes = {}
+        for df in fs.list_directories_and_files(storageLoc, sourceDir):
+            if df.name.endswith('.txt') or df.name.endswith('.csv'):
+                self.sizes[df.name] = df.properties.content_length
+        self.fnames = [f for f in self.sizes if f.endswith('.txt')]
+        self.nextFiles = {}  # fname -> fname expected to be opened after it
+        self._pool = BufferPool()
+        self._prefetcher = ThreadPoolExecutor(max_workers=1)
+        self._pending = {}
+        if saveDir:
+            os.makedirs(saveDir, exist_ok=True)
+
+    def listAll(self):
+        return list(self.sizes)
+
+    def open(self, fname):
+        future = self._pending.pop(fname, None)
+        fileLines = future.result() if future else self._fetch(fname)
+        if fname in self.nextFiles:
+            self.prefetch(self.nextFiles[fname])  # downloads while this file is parsed and tested
+        return fileLines
+
+    def prefetch(self, fname):
+        if fname not in self._pending:
+            self._pending[fname] = self._prefetcher.submit(self._fetch, fname)
+
+    def _fetch(self, fname):
+        print(f"streaming {fname}")
+        buffer = self._pool.acquire(self.sizes[fname] or 0)
+        buffer.seek(0)
+        try:
+            self.fs.get_file_to_stream(self.storageLoc, self.sourceDir, fname, buffer, max_connections=1)
+        except ValueError:  # grew since it was listed, does not fit the buffer
+            self._pool.release(buffer)
+            self.sizes[fname] = self.fs.get_file_properties(self.storageLoc, self.sourceDir, fname).properties.content_length
+            return self._fetch(fname)
+        size = buffer.tell()
+        if self.saveDir:
+            with open(os.path.join(self.saveDir, fname), 'wb') as f, memoryview(buffer) as view, view[:size] as content:
+                f.write(content)
+        return PooledLines(buffer, size, self._pool)
+
+
+class BidFileCache:
+    # get leases a document and release returns it; released documents stay cached until more than
+    # maxFiles are open, then the least recently used ones that are not leased are closed
+    def __init__(self, source, maxFiles, parseCache=None):
+        self.source = source
+        self.maxFiles = maxFiles
+        self.parseCache = parseCache
+        self._docs = OrderedDict()
+        self._leases = {}  # fname -> count of get calls not released yet
+
+    def get(self, fname):
+        doc = self._docs.get(fname)
+        if doc is None:
+            self._evict(self.maxFiles - 1)  # closed first, so a pooled buffer is free for the new one
+            doc = self._load(fname)
+            self._docs[fname] = doc
+        else:
+            self._docs.move_to_end(fname)
+        self._leases[fname] = self._leases.get(fname, 0) + 1
+        return doc
+
+    def isLeased(self, fname):
+        return fname in self._leases
+
+    def release(self, fname):
+        leases = self._leases.pop(fname, 0) - 1
+        if leases > 0:
+            self._leases[fname] = leases
+        else:
+            self._evict(self.maxFiles)
+
+    def _evict(self, maxDocs):
+        unleased = [f for f in self._docs if f not in self._leases]
+        for fname in unleased[:max(len(self._docs) - maxDocs, 0)]:
+            self._docs.pop(fname).close()
+
+    def prefetch(self, fname):
+        if fname not in self._docs:
+            self.source.prefetch(fname)
+
+    def expectOrder(self, fnames):
+        if isinstance(self.source, StorageStreamSource):  # mapped local files need no read ahead
+            self.source.nextFiles = dict(zip(fnames, fnames[1:]))
+
+    def _load(self, fname):
+        fileLines = self.source.open(fname)
+        if self.parseCache:
+            return self.parseCache.load(fname, fileLines)
+        return BidDocument(fname, fileLines)
+
+
+def bidFileOf(item):
+    return item.callspec.params.get('bidFile') if hasattr(item, 'callspec') else None
+
+
+def readCacheBidFiles(metafunc, dirPath, envConfig):
+    if hasattr(metafunc.config, 'bidFileCache'):
+        bidFileCache = metafunc.config.bidFileCache
+    else:
+        parseCache = None
+        if envConfig.get('BID_PARSE_CACHE_DIR'):
+            maxBytes = envConfig.get('BID_PARSE_CACHE_MAX_MB', 500) * 1024 * 1024
+            parseCache = BidParseCache(envConfig['BID_PARSE_CACHE_DIR'], maxBytes)
+        maxFiles = envConfig.get('BID_FILES_CACHE_SIZE', 8)
+        source = LocalFileSource(dirPath) if dirPath else streamStoredFiles(metafunc, envConfig)
+        bidFileCache = BidFileCache(source, maxFiles, parseCache)
+        metafunc.config.bidFileCache = bidFileCache
+    return bidFileCache.source.fnames
+
+
+def streamStoredFiles(metafunc, envConfig):
+    storeDir = extractStoreDir(envConfig['BID_FILES_DIR'], STORAGE_PREFIX)
+    fs = azuretest.createFileService(envConfig, metafunc.config.getoption('storekey'))
+    saveDir = localPath(storeDir) if envConfig.get('BID_FILES_STREAM_SAVE', False) else None
+    return StorageStreamSource(fs, envConfig['STORAGE_LOCATION'], storeDir, saveDir)
+
+
+def isStreamed(envConfig):
+    return envConfig.get('BID_FILES_STREAM', False) and envConfig['BID_FILES_DIR'].startswith(STORAGE_PREFIX)
+
+
+def selectsBidFileTests(config):
+    # the xdist controller does not collect, so this tells from the command line paths
+    testsPath = os.path.join(os.path.dirname(os.path.abspath(__file__)), BID_FILE_TESTS)
+    for arg in config.args:
+        argPath = os.path.abspath(os.path.join(str(config.invocation_params.dir), arg.split('::')[0]))
+        if testsPath == argPath or testsPath.startswith(os.path.join(argPath, '')):
+            return True
+    return False
+
+
+def readCacheBidFilesDir(metafunc):
+    envConfig = anytest.readCacheEnvConfig(metafunc)
+    configPath = envConfig['BID_FILES_DIR']
+    if isStreamed(envConfig):
+        return None  # nothing to download, see streamStoredFiles
+    elif configPath.startswith(STORAGE_PREFIX):
+        workerInput = getattr(metafunc.config, 'workerinput', {})
+        if WORKER_FILES_DIR in workerInput:
+            return workerInput[WORKER_FILES_DIR]  # synced once by the xdist controller
+        storeDir = extractStoreDir(configPath, STORAGE_PREFIX)
+        return azuretest.downloadCacheStoredFiles(metafunc, envConfig, storeDir, localPath(storeDir))
+    else:
+        return configPath
+
+
+def extractStoreDir(configPath, storagePrefix):
+    storeTo = configPath[len(storagePrefix):]
+    assert storeTo, f'storage download dir is not conigured'
+    if storeTo.upper() == 'TODAY':
+        return datetime.datetime.today().strftime('%Y/%m/%d')
+    else:
+        return storeTo
+
+
+def localPath(storeDir):
+    return os.path.join('tmp', storeDir)
@@ -0,0 +1,98 @@
+import os
+import sys
+import csv
+import json
+import argparse
+import bidschema
+import bidtest
+
+
+REPORT_FIELDS = ['file', 'group', 'section', 'line', 'message']
+
+
+def validateFile(dirPath, fname, parseCache=None):
+    fileLines = bidtest.mapTextFile(os.path.join(dirPath, fname), verbose=False)
+    if parseCache:
+        doc = parseCache.load(fname, fileLines)
+    else:
+        doc = bidtest.BidDocument(fname, fileLines)
+    try:
+        return bidschema.validate(doc)
+    finally:
+        doc.close()
+
+
+def iterValidate(dirPath, parseCache=None):
+    # one file is mapped at a time
+    entries = sorted(e.name for e in os.scandir(dirPath) if e.is_file() and e.name.endswith('.txt'))
+    for fname in entries:
+        yield fname, validateFile(dirPath, fname, parseCache)
+
+
+def validateDirectory(dirPath, parseCache=None):
+    report = {'dir': dirPath, 'files': 0, 'invalidFiles': 0, 'violations': []}
+    for fname, violations in iterValidate(dirPath, parseCache):
+        addToReport(report, fname, violations)
+    return report
+
+
+def addToReport(report, fname, violations):
+    report['files'] += 1
+    if violations:
+        report['invalidFiles'] += 1
+    report['violations'].extend(violationRow(fname, v) for v in violations)
+
+
+def violationRow(fname, violation):
+    return dict(zip(REPORT_FIELDS, [fname, violation.group, violation.path, violation.lineNo, violation.message]))
+
+
+def writeJsonReport(dirPath, out, parseCache=None):
+    report = validateDirectory(dirPath, parseCache)
+    json.dump(report, out, indent=2)
+    out.write('\n')
+    return report
+
+
+def writeCsvReport(dirPath, out, parseCache=None):
+    # rows are written as each file is validated, the report never holds all violations
+    report = {'dir': dirPath, 'files': 0, 'invalidFiles': 0, 'violations': []}
+    writer = csv.DictWriter(out, REPORT_FIELDS)
+    writer.writeheader()
+    for fname, violations in iterValidate(dirPath, parseCache):
+        addToReport(report, fname, violations)
+        writer.writerows(report['violations'])
+        report['violations'].clear()
+    return report
+
+
+REPORT_WRITERS = {
+    'json': writeJsonReport,
+    'csv': writeCsvReport,
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Validate all bid files in a directory')
+    parser.add_argument('dir', help='directory with bid files (*.txt)')
+    parser.add_argument('--format', choices=list(REPORT_WRITERS), default='json', help='report format')
+    parser.add_argument('--output', help='report file, default is stdout')
+    parser.add_argument('--parse-cache', help='directory for persisted parsed bid files, see BID_PARSE_CACHE_DIR')
+    parser.add_argument('--parse-cache-max-mb', type=int, default=500)
+    args = parser.parse_args(argv)
+
+    parseCache = None
+    if args.parse_cache:
+        parseCache = bidtest.BidParseCache(args.parse_cache, args.parse_cache_max_mb * 1024 * 1024)
+    writeReport = REPORT_WRITERS[args.format]
+    if args.output:
+        with open(args.output, 'w', newline='') as out:
+            report = writeReport(args.dir, out, parseCache)
+    else:
+        report = writeReport(args.dir, sys.stdout, parseCache)
+    print(f"validated {report['files']} files in {args.dir}, {report['invalidFiles']} with violations", file=sys.stderr)
+    return 1 if report['invalidFiles'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
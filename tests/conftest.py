@@ -5,7 +5,12 @@ import pydocumentdb.document_client as docDbClient
 from azure.storage.file import FileService
 from ftplib import FTP
 import anytest
-import struct
+import apitest
+import azuretest
+import bidmanifest
+import bidtest
+import dbtest
+from collections import OrderedDict
 
 
 def pytest_addoption(parser):
@@ -25,6 +30,64 @@ def pytest_addoption(parser):
         help="provide Username for FTP server")
     parser.addoption("--ftppwd", action="store",
         help="provide Password for FTP server")
+    parser.addoption("--incremental", action="store_true",
+        help="run bid file tests only for new or modified files, replay stored results for the rest")
+    parser.addoption("--bench", action="store_true",
+        help="run benchmarks, they are skipped by default")
+    parser.addoption("--load", action="store_true",
+        help="run API load tests, they are skipped by default")
+
+
+def pytest_configure(config):
+    config.addinivalue_line("markers", "noreplay: always run, even for unchanged files in --incremental mode")
+    config.addinivalue_line("markers", "bench: benchmark, only runs with --bench")
+    config.addinivalue_line("markers", "load: API load test, only runs with --load")
+    if config.getoption("incremental"):
+        envConfig = anytest.loadEnvConfig(config.getoption("env"))
+        config.bidManifest = bidmanifest.BidManifest(envConfig.get('BID_MANIFEST_PATH', 'tmp/bidmanifest.json'))
+        config.pluginmanager.register(config.bidManifest, 'bidManifest')
+
+
+@pytest.hookimpl(optionalhook=True)
+def pytest_configure_node(node):
+    # xdist controller downloads bid files once, before its workers collect them, and only when
+    # bid file tests are selected; workers reuse the dir it synced instead of syncing it again
+    if bidtest.selectsBidFileTests(node.config):
+        bidtest.readCacheBidFilesDir(node)  # node has .config like metafunc
+    if hasattr(node.config, 'filesDownloadedTo'):
+        node.workerinput[bidtest.WORKER_FILES_DIR] = node.config.filesDownloadedTo
+
+
+def pytest_collection_modifyitems(config, items):
+    for marker, what in [('bench', 'benchmarks'), ('load', 'API load tests')]:
+        if not config.getoption(marker):
+            skipOptIn = pytest.mark.skip(reason=f'{what} only run with --{marker}')
+            for item in items:
+                if item.get_closest_marker(marker):
+                    item.add_marker(skipOptIn)
+    if config.getoption("incremental"):
+        bidmanifest.markReplays(config, items)
+    if hasattr(config, 'bidFileCache') and not hasattr(config, 'workerinput'):
+        # run order is only known without xdist, workers get next file hints per test below
+        fnames = [f for f in map(bidtest.bidFileOf, items) if f]
+        config.bidFileCache.expectOrder(list(OrderedDict.fromkeys(fnames)))
+
+
+@pytest.hookimpl(tryfirst=True)
+def pytest_runtest_protocol(item, nextitem):
+    nextFile = bidtest.bidFileOf(nextitem) if nextitem else None
+    if nextFile and nextFile != bidtest.bidFileOf(item):
+        item.config.bidFileCache.prefetch(nextFile)
+    if hasattr(item, 'bidReplayResult'):
+        bidmanifest.replay(item)
+        return True
+
+
+@pytest.hookimpl(hookwrapper=True)
+def pytest_runtest_makereport(item, call):
+    outcome = yield
+    if hasattr(item, 'bidReplay'):
+        outcome.get_result().bidReplay = item.bidReplay
 
 
 def readVerifyOptVal(request, opt, verify=True):
@@ -61,6 +124,16 @@ def apiBaseUrl(config, envName):
         return baseUrl
 
 
+@pytest.fixture(scope='session')
+def http(config):
+    # one pooled keep-alive session for all API calls, saves a TCP and TLS handshake per request
+    timeout = (config.get('API_CONNECT_TIMEOUT_SECONDS', 5), config.get('API_READ_TIMEOUT_SECONDS', 30))
+    session = apitest.createHttpSession(config.get('API_POOL_SIZE', 10), config.get('API_RETRIES', 3),
+        config.get('API_RETRY_BACKOFF_SECONDS', 0.3), timeout)
+    yield session
+    session.close()
+
+
 @pytest.fixture(scope='session')
 def apiCode(request, envName):
     anytest.ensureSupportedEnv(envName, ['tst-cloud', ])
@@ -68,23 +141,25 @@ def apiCode(request, envName):
 
 
 @pytest.fixture(scope='session')
-def dbConn(request, config):
+def dbPool(request, config):
     dbUid = readVerifyOptVal(request, "--dbuid")
     dbPwd = readVerifyOptVal(request, "--dbpwd")
     connStr = config['DB_CONN'] + f' UID={dbUid}; PWD={dbPwd};'
     print(f'connStr={connStr}')
-    conn = pyodbc.connect(connStr)
-    conn.add_output_converter(-155, handle_datetimeoffset)
-    cursor = conn.cursor()
-    prefix = config.get('DB_PREFIX', '')
-    return cursor, prefix
+
+    def connect():
+        return dbtest.addOutputConverters(pyodbc.connect(connStr))
+    pool = dbtest.ConnectionPool(connect, config.get('DB_POOL_SIZE', 4), config.get('DB_HEALTH_QUERY', 'SELECT 1'))
+    yield pool
+    pool.close()
 
 
-def handle_datetimeoffset(dto_value):
-    # ref: https://github.com/mkleehammer/pyodbc/issues/134#issuecomment-281739794
-    tup = struct.unpack("<6hI2h", dto_value)  # e.g., (2017, 3, 16, 10, 35, 18, 0, -6, 0)
-    tweaked = [tup[i] // 100 if i == 6 else tup[i] for i in range(len(tup))]
-    return "{:04d}-{:02d}-{:02d} {:02d}:{:02d}:{:02d}.{:07d} {:+03d}:{:02d}".format(*tweaked)
+@pytest.fixture
+def dbConn(dbPool, config):
+    # each test leases its own connection and cursor, so result sets are never shared
+    with dbPool.lease() as cursor:
+        prefix = config.get('DB_PREFIX', '')
+        yield cursor, prefix
 
 
 @pytest.fixture(scope='session')
@@ -93,6 +168,16 @@ def cosmosClient(request, config):
     return docDbClient.DocumentClient(config['COSMOSDB_URL'], {'masterKey': key})
 
 
+@pytest.fixture(scope='session')
+def cosmosWaiter(request, config):
+    # own client for the change feed reader thread, see azuretest.CosmosChangeFeedWaiter
+    key = readVerifyOptVal(request, "--cosmoskey")
+    client = docDbClient.DocumentClient(config['COSMOSDB_URL'], {'masterKey': key})
+    waiter = azuretest.CosmosChangeFeedWaiter(client, config['COSMOSDB_COLL_PATH'], config.get('COSMOSDB_POLL_SECONDS', 0.2))
+    yield waiter
+    waiter.stop()
+
+
 @pytest.fixture(scope='session')
 def ftp(request, config, envName):
     anytest.ensureSupportedEnv(envName, ['dev-local'])
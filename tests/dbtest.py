@@ -1,3 +1,16 @@
+import os
+import csv
+import time
+import queue
+import struct
+import threading
+import itertools
+import functools
+from collections import namedtuple
+from contextlib import contextmanager
+import yaml
+import pytest
+import pyodbc
 import anytest
 
 
@@ -18,6 +31,349 @@ def _toReadOneRow(cursor, query):
     return read
 
 
+def iterRows(cursor, query, params=(), arraysize=1000, named=False):
+    # yields rows fetchmany batches at a time, so a scan holds at most arraysize rows in memory
+    cursor.arraysize = arraysize
+    if params:
+        cursor.execute(query, params)
+    else:
+        cursor.execute(query)
+    make = rowType(tuple(desc[0] for desc in cursor.description))._make if named else None
+    while True:
+        rows = cursor.fetchmany()
+        if not rows:
+            return
+        yield from (map(make, rows) if make else rows)
+
+
+class RowAggregates:
+    # count, duplicate keys and min/max per group evaluated incrementally over a row stream;
+    # with sortedKeys rows come ORDER BY key and duplicates are found without keeping the seen keys
+    def __init__(self, keyOf=None, groupOf=None, valueOf=None, sortedKeys=False, maxDuplicates=10):
+        self.keyOf = keyOf
+        self.groupOf = groupOf
+        self.valueOf = valueOf
+        self.sortedKeys = sortedKeys
+        self.maxDuplicates = maxDuplicates
+        self.count = 0
+        self.duplicates = []
+        self.duplicateCount = 0
+        self.groups = {}  # group -> [min, max]
+        self._seen = set()
+        self._lastKey = None
+
+    def add(self, row):
+        self.count += 1
+        if self.keyOf:
+            self._addKey(self.keyOf(row))
+        if self.groupOf:
+            group, value = self.groupOf(row), self.valueOf(row)
+            bounds = self.groups.get(group)
+            if bounds is None:
+                self.groups[group] = [value, value]
+            elif value < bounds[0]:
+                bounds[0] = value
+            elif value > bounds[1]:
+                bounds[1] = value
+        return self
+
+    def addAll(self, rows):
+        for row in rows:
+            self.add(row)
+        return self
+
+    def _addKey(self, key):
+        if self.sortedKeys:
+            isDuplicate = self.count > 1 and key == self._lastKey
+            self._lastKey = key
+        else:
+            isDuplicate = key in self._seen
+            self._seen.add(key)
+        if isDuplicate:
+            self.duplicateCount += 1
+            if len(self.duplicates) < self.maxDuplicates:
+                self.duplicates.append(key)
+
+    def summary(self):
+        return {'count': self.count, 'duplicates': self.duplicateCount, 'groups': len(self.groups)}
+
+
+def loadDataset(fpath):
+    # CSV with a header row, or YAML with a list of rows as mappings; returns columns and an iterable of row tuples
+    if os.path.splitext(fpath)[1].lower() == '.csv':
+        with open(fpath, newline='') as f:
+            columns = next(csv.reader(f))
+        return columns, _readCsvRows(fpath)
+    with open(fpath) as f:
+        records = yaml.safe_load(f)
+    columns = list(records[0].keys()) if records else []
+    return columns, [tuple(r[c] for c in columns) for r in records]
+
+
+def _readCsvRows(fpath):
+    with open(fpath, newline='') as f:
+        reader = csv.reader(f)
+        next(reader)
+        for row in reader:
+            yield tuple(row)
+
+
+def insertRows(cursor, table, columns, rows, batchSize=10000):
+    insert = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})"
+    rows = iter(rows)
+    count = 0
+    while True:
+        batch = list(itertools.islice(rows, batchSize))
+        if not batch:
+            return count
+        cursor.executemany(insert, batch)
+        count += len(batch)
+
+
+def seededDataset(conn, table, fpath, **options):
+    columns, rows = loadDataset(fpath)
+    return seededTable(conn, table, columns, rows, **options)
+
+
+@contextmanager
+def seededTable(conn, table, columns, rows, fastExecutemany=True, batchSize=10000, identityInsert=None):
+    # replaces the table content with rows in one transaction, the previous content is copied to a backup
+    # table on the server and put back afterwards. identityInsert: restore the original IDENTITY column
+    # values with SET IDENTITY_INSERT, None detects whether the table has one
+    cursor = conn.cursor()
+    if fastExecutemany:
+        cursor.fast_executemany = True  # one round-trip per batch with drivers supporting parameter arrays
+    backupTable = table + BACKUP_SUFFIX
+    try:
+        _backupTable(conn, cursor, table, backupTable)
+        try:
+            _replaceRows(conn, cursor, table, columns, rows, batchSize)
+        except BaseException:
+            cursor.execute(f'DROP TABLE {backupTable}')  # the seed rolled back, the table is unchanged
+            conn.commit()
+            raise
+        try:
+            yield cursor
+        finally:
+            try:
+                _restoreTable(conn, cursor, table, backupTable, identityInsert)
+            except BaseException:
+                print(f'table={table} not restored, its original rows are kept in table={backupTable}')
+                raise
+    finally:
+        cursor.close()
+
+
+BACKUP_SUFFIX = '_seedBackup'
+
+
+def _backupTable(conn, cursor, table, backupTable):
+    # an existing backup table is left from a run that could not restore it, so it is never replaced
+    try:
+        cursor.execute(f'SELECT * INTO {backupTable} FROM {table}')  # SQL Server, Access
+    except Exception as err:
+        conn.rollback()
+        try:
+            cursor.execute(f'CREATE TABLE {backupTable} AS SELECT * FROM {table}')  # SQLite
+        except Exception:
+            conn.rollback()
+            raise err
+    conn.commit()
+
+
+def _restoreTable(conn, cursor, table, backupTable, identityInsert):
+    identities = identityColumns(cursor, table)
+    setIdentityInsert = identityInsert
+    if identityInsert is None:
+        setIdentityInsert = bool(identities) and not isAccessDb(conn)
+    cursor.execute(f'SELECT * FROM {backupTable} WHERE 1 = 0')
+    columns = [desc[0] for desc in cursor.description]
+    if identityInsert is False:
+        columns = [c for c in columns if c not in identities]  # restored rows get new identity values
+    columnList = ', '.join(columns)
+    try:
+        cursor.execute(f'DELETE FROM {table}')
+        if setIdentityInsert:
+            cursor.execute(f'SET IDENTITY_INSERT {table} ON')
+        cursor.execute(f'INSERT INTO {table} ({columnList}) SELECT {columnList} FROM {backupTable}')
+        if setIdentityInsert:
+            cursor.execute(f'SET IDENTITY_INSERT {table} OFF')
+        cursor.execute(f'DROP TABLE {backupTable}')
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    print(f'restored table={table}')
+
+
+def identityColumns(cursor, table):
+    # IDENTITY (SQL Server) or AutoNumber (Access) columns, drivers without ODBC catalog calls report none
+    if not hasattr(cursor, 'columns'):
+        return set()
+    schema, _, name = table.rpartition('.')
+    return {col.column_name for col in cursor.columns(table=name, schema=schema or None)
+        if 'identity' in col.type_name.lower() or col.type_name.upper() == 'COUNTER'}
+
+
+def isAccessDb(conn):
+    # Access inserts explicit AutoNumber values without IDENTITY_INSERT and does not know the statement
+    return 'ACCESS' in conn.getinfo(pyodbc.SQL_DBMS_NAME).upper() if hasattr(conn, 'getinfo') else False
+
+
+def _replaceRows(conn, cursor, table, columns, rows, batchSize):
+    try:
+        cursor.execute(f'DELETE FROM {table}')
+        count = insertRows(cursor, table, columns, rows, batchSize)
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    print(f'seeded table={table} rows={count}')
+
+
+def readResultSets(cursor, queries, batched=True):
+    # batched sends all queries in one round-trip and reads the result sets with nextset
+    if not batched:
+        return [cursor.execute(query).fetchall() for query in queries]
+    cursor.execute(';\n'.join(queries))
+    results = [cursor.fetchall()]
+    while len(results) < len(queries):
+        assert cursor.nextset(), f'expected {len(queries)} result sets but found {len(results)}'
+        results.append(cursor.fetchall())
+    return results
+
+
+def waitReadOneRows(cursor, queries, watermarkQuery, timeoutSeconds=20, pollSeconds=0.2, batched=True):
+    # re-runs queries only after the cheap watermarkQuery value changed, e.g. MAX(id), MAX(rowversion)
+    # or CHANGE_TRACKING_CURRENT_VERSION(); returns the single row of each query
+    deadline = time.monotonic() + timeoutSeconds
+    results = readResultSets(cursor, [watermarkQuery] + queries, batched)
+    while True:
+        watermark = [tuple(row) for row in results[0]]
+        counts = [len(rows) for rows in results[1:]]
+        if all(count == 1 for count in counts):
+            return [rows[0] for rows in results[1:]]
+        if time.monotonic() > deadline:
+            pytest.fail(f'Expected 1 row per query within {timeoutSeconds}s but found records={counts} queries={queries}')
+        time.sleep(pollSeconds)
+        if [tuple(row) for row in readResultSets(cursor, [watermarkQuery])[0]] != watermark:
+            results = readResultSets(cursor, [watermarkQuery] + queries, batched)
+
+
 def addColumnNames(row, cursor):
     columns = [desc[0] for desc in cursor.description]
     return dict(zip(columns, row))
+
+
+# --- Row decoding ---
+
+
+SQL_DATETIMEOFFSET = -155
+_DATETIMEOFFSET = struct.Struct('<6hI2h')  # e.g., (2017, 3, 16, 10, 35, 18, 0, -6, 0)
+
+
+def decodeDatetimeoffset(dtoValue):
+    # ref: https://github.com/mkleehammer/pyodbc/issues/134#issuecomment-281739794
+    year, month, day, hour, minute, second, nanos, tzHour, tzMinute = _DATETIMEOFFSET.unpack(dtoValue)
+    return f'{year:04d}-{month:02d}-{day:02d} {hour:02d}:{minute:02d}:{second:02d}.{nanos // 100:07d} {tzHour:+03d}:{tzMinute:02d}'
+
+
+OUTPUT_CONVERTERS = {
+    SQL_DATETIMEOFFSET: decodeDatetimeoffset,
+}
+
+
+def addOutputConverters(conn, converters=OUTPUT_CONVERTERS):
+    for sqlType, convert in converters.items():
+        conn.add_output_converter(sqlType, convert)
+    return conn
+
+
+@functools.lru_cache(maxsize=256)
+def rowType(columns):
+    # one namedtuple class per distinct column list, columns that are not identifiers are renamed _0, _1...
+    return namedtuple('Row', columns, rename=True)
+
+
+def namedRows(cursor, rows):
+    # the column mapping is computed once per result set, not per row
+    make = rowType(tuple(desc[0] for desc in cursor.description))._make
+    return [make(row) for row in rows]
+
+
+def fetchNamed(cursor):
+    return namedRows(cursor, cursor.fetchall())
+
+
+class ConnectionPool:
+    # connections are checked with healthQuery on checkout and replaced when it fails
+    def __init__(self, connect, size, healthQuery='SELECT 1', checkoutSeconds=60):
+        self._connect = connect
+        self.size = size
+        self.healthQuery = healthQuery
+        self.checkoutSeconds = checkoutSeconds
+        self.reconnects = 0
+        self._idle = queue.LifoQueue()  # most recently used first, keeps the fewest connections warm
+        self._slots = threading.BoundedSemaphore(size)
+
+    def acquire(self):
+        assert self._slots.acquire(timeout=self.checkoutSeconds), \
+            f'no db connection free after {self.checkoutSeconds}s, pool size={self.size}'
+        try:
+            while True:
+                try:
+                    conn = self._idle.get_nowait()
+                except queue.Empty:
+                    return self._connect()
+                if self._isHealthy(conn):
+                    return conn
+                self.reconnects += 1
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def release(self, conn):
+        # uncommitted work and its locks must not leak into the next lease
+        try:
+            conn.rollback()
+            self._idle.put(conn)
+        except pyodbc.Error as err:
+            print(f'dropping db connection that failed to roll back - {err}')
+            closeQuietly(conn)
+        finally:
+            self._slots.release()
+
+    @contextmanager
+    def lease(self):
+        conn = self.acquire()
+        cursor = None
+        try:
+            cursor = conn.cursor()
+            yield cursor
+        finally:
+            closeQuietly(cursor)
+            self.release(conn)
+
+    def close(self):
+        while not self._idle.empty():
+            closeQuietly(self._idle.get_nowait())
+
+    def _isHealthy(self, conn):
+        try:
+            cursor = conn.cursor()
+            cursor.execute(self.healthQuery)
+            cursor.fetchall()
+            cursor.close()
+            return True
+        except pyodbc.Error as err:
+            print(f'dropping broken db connection - {err}')
+            closeQuietly(conn)
+            return False
+
+
+def closeQuietly(closeable):
+    try:
+        if closeable is not None:
+            closeable.close()
+    except pyodbc.Error:
+        pass
@@ -0,0 +1,92 @@
+import math
+import time
+import itertools
+import asyncio
+import aiohttp
+
+
+PERCENTILES = [50, 95, 99]
+
+
+class LoadResult:
+    def __init__(self):
+        self.latencies = []  # seconds of successful requests
+        self.errors = []  # status or exception name of each failed request
+        self.requests = 0
+        self.elapsed = 0.0
+
+    def record(self, latency, error=None):
+        self.requests += 1
+        if error is None:
+            self.latencies.append(latency)
+        else:
+            self.errors.append(error)
+
+    def percentileMs(self, percentile):
+        # nearest rank over the successful requests
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        return round(ordered[max(math.ceil(percentile / 100 * len(ordered)) - 1, 0)] * 1000, 1)
+
+    def summary(self):
+        result = {
+            'requests': self.requests,
+            'errors': len(self.errors),
+            'errorRate': round(len(self.errors) / self.requests, 4) if self.requests else 0.0,
+            'rps': round(self.requests / self.elapsed, 1) if self.elapsed else 0.0,
+        }
+        for percentile in PERCENTILES:
+            result[f'p{percentile}Ms'] = self.percentileMs(percentile)
+        return result
+
+
+def runLoad(sendRequest, clients=10, durationSeconds=None, requestCount=None, timeoutSeconds=30):
+    # clients concurrent asyncio clients call sendRequest(session, idx) -> response status
+    # until durationSeconds passed or requestCount requests were sent, whichever comes first
+    assert durationSeconds or requestCount, 'expected a load durationSeconds or requestCount'
+    return asyncio.run(_runLoad(sendRequest, clients, durationSeconds, requestCount, timeoutSeconds))
+
+
+async def _runLoad(sendRequest, clients, durationSeconds, requestCount, timeoutSeconds):
+    result = LoadResult()
+    counter = iter(range(requestCount)) if requestCount else itertools.count()
+    start = time.perf_counter()
+    stopAt = start + durationSeconds if durationSeconds else None
+
+    async def client(session):
+        for idx in counter:
+            if stopAt and time.perf_counter() >= stopAt:
+                return
+            sent = time.perf_counter()
+            try:
+                status = await sendRequest(session, idx)
+                error = None if 200 <= status <= 299 else status
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                error = type(e).__name__
+            result.record(time.perf_counter() - sent, error)
+
+    timeout = aiohttp.ClientTimeout(total=timeoutSeconds)
+    connector = aiohttp.TCPConnector(limit=clients)
+    async with aiohttp.ClientSession(timeout=timeout, connector=connector) as session:
+        await asyncio.gather(*(client(session) for _ in range(clients)))
+    result.elapsed = time.perf_counter() - start
+    return result
+
+
+# --- Verify helpers ---
+
+
+def verifySlo(summary, slo, errCtx=''):
+    # slo keys: p50Ms, p95Ms, p99Ms and maxErrorRate are upper bounds, minRps a lower bound
+    breaches = []
+    for name, limit in slo.items():
+        if name == 'minRps':
+            if summary['rps'] < limit:
+                breaches.append(f'rps={summary["rps"]} < {limit}')
+        elif name == 'maxErrorRate':
+            if summary['errorRate'] > limit:
+                breaches.append(f'errorRate={summary["errorRate"]} > {limit}')
+        elif summary[name] is None or summary[name] > limit:
+            breaches.append(f'{name}={summary[name]} > {limit}')
+    assert not breaches, f'SLO breached: {", ".join(breaches)} {errCtx}summary={summary}'
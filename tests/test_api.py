@@ -1,6 +1,6 @@
 import pytest
-import requests
 import anytest
+import apischema
 import apitest
 
 
@@ -13,12 +13,18 @@ def apiUrl(apiBaseUrl, envName):
     return f'{apiBaseUrl}/{ENDPOINT}'
 
 
-def test_GET(config, apiUrl):
-    resp = requests.get(apiUrl)
+def test_GET(config, http, apiUrl):
+    resp = http.get(apiUrl)
     apitest.verifyResponse(resp, isJson=True, respCodeRange=(200, 299), respEmptyOk=True)
 
 
+def test_GET_items(config, http, apiUrl):
+    with http.get(apiUrl, stream=True) as resp:
+        count = apitest.verifyJsonArray(resp, apischema.itemValidator(ENDPOINT), f'url={apiUrl} ')
+    assert count > 0, f'url={apiUrl} expected {ENDPOINT}'
+
+
 @pytest.mark.parametrize("req", ['TEST'])
-def test_POST(config, apiUrl, req):
-    resp = requests.post(apiUrl, req)
+def test_POST(config, http, apiUrl, req):
+    resp = http.post(apiUrl, req)
     apitest.verifyResponse(resp, isJson=False, respCodeRange=(200, 299))
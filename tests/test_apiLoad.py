@@ -0,0 +1,80 @@
+import pytest
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import loadtest
+
+
+class StatusStubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive
+
+    def do_GET(self):
+        time.sleep(self.server.delaySeconds)
+        self.reply(b'{"Status": true}')
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        self.reply(b'{"Status": true}', 500 if self.path.startswith('/fail') else 200)
+
+    def reply(self, body, status=200):
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stubUrl():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StatusStubHandler)
+    server.daemon_threads = True
+    server.delaySeconds = 0.01
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f'http://127.0.0.1:{server.server_address[1]}'
+    server.shutdown()
+    server.server_close()
+
+
+def getThenPost(getUrl, postUrl, postEvery):
+    async def sendRequest(session, idx):
+        if idx % postEvery == postEvery - 1:
+            async with session.post(postUrl, json={'Status': True}) as resp:
+                await resp.read()
+        else:
+            async with session.get(getUrl) as resp:
+                await resp.read()
+        return resp.status
+    return sendRequest
+
+
+def test_requestCount(stubUrl):
+    result = loadtest.runLoad(getThenPost(f'{stubUrl}/GetStatus', f'{stubUrl}/SetStatus', 5), clients=8, requestCount=200)
+    summary = result.summary()
+    assert summary['requests'] == 200 and summary['errors'] == 0, f'summary={summary}'
+    assert 10 <= summary['p50Ms'] <= summary['p95Ms'] <= summary['p99Ms'], f'summary={summary}'
+    assert summary['rps'] > 2 * 1000 / summary['p50Ms'], f'expected the 8 clients to overlap their requests, summary={summary}'
+    loadtest.verifySlo(summary, {'p99Ms': 1000, 'maxErrorRate': 0})
+
+
+def test_durationWithErrors(stubUrl):
+    result = loadtest.runLoad(getThenPost(f'{stubUrl}/GetStatus', f'{stubUrl}/fail', 2), clients=4, durationSeconds=0.3)
+    summary = result.summary()
+    assert 0.3 <= result.elapsed < 1, f'expected the load to stop after its duration but took {result.elapsed}s'
+    assert set(result.errors) == {500} and 0.4 < summary['errorRate'] < 0.6, f'summary={summary}'
+    with pytest.raises(AssertionError, match='errorRate=.* > 0.01'):
+        loadtest.verifySlo(summary, {'p50Ms': 1000, 'maxErrorRate': 0.01})
+
+
+def test_percentiles():
+    result = loadtest.LoadResult()
+    for ms in range(1, 101):
+        result.record(ms / 1000)
+    result.record(5, error='ClientConnectorError')
+    result.elapsed = 1
+    assert result.summary() == {'requests': 101, 'errors': 1, 'errorRate': 0.0099, 'rps': 101.0,
+        'p50Ms': 50.0, 'p95Ms': 95.0, 'p99Ms': 99.0}
+    with pytest.raises(AssertionError, match='p95Ms=95.0 > 90, rps=101.0 < 200'):
+        loadtest.verifySlo(result.summary(), {'p50Ms': 60, 'p95Ms': 90, 'minRps': 200})
@@ -1,5 +1,4 @@
 import pytest
-import requests
 import anytest
 import apitest
 
@@ -27,20 +26,20 @@ def makeUrl(apiBaseUrl, endpoint, apiCode):
     return f'{apiBaseUrl}/{endpoint}?code={apiCode}'
 
 
-def test_getUsingPost_notFound(apiBaseUrl, getEndpoint, apiCode):
+def test_getUsingPost_notFound(http, apiBaseUrl, getEndpoint, apiCode):
     url = makeUrl(apiBaseUrl, getEndpoint, apiCode)
-    resp = requests.post(url, {})
+    resp = http.post(url, {})
     apitest.verifyResponse(resp, isJson=False, respCodeRange=(404, 404), respEmptyOk=True)
 
 
-def test_postUsingGet_notFound(apiBaseUrl, postEndpoint, apiCode):
+def test_postUsingGet_notFound(http, apiBaseUrl, postEndpoint, apiCode):
     url = makeUrl(apiBaseUrl, postEndpoint, apiCode)
-    resp = requests.get(url)
+    resp = http.get(url)
     apitest.verifyResponse(resp, isJson=False, respCodeRange=(404, 404), respEmptyOk=True)
 
 
 @pytest.mark.parametrize("req", ['', 'TEST', '{}', {}, {'unexpected': 'key'}])
-def test_postInvalidJson(apiBaseUrl, postEndpoint, apiCode, req):
+def test_postInvalidJson(http, apiBaseUrl, postEndpoint, apiCode, req):
     url = makeUrl(apiBaseUrl, postEndpoint, apiCode)
-    resp = requests.post(url, json=req)
+    resp = http.post(url, json=req)
     apitest.verifyResponse(resp, isJson=True, respCodeRange=(400, 400))
\ No newline at end of file
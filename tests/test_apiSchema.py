@@ -0,0 +1,83 @@
+import pytest
+import io
+import json
+import time
+import requests
+import apischema
+import apitest
+
+
+STATUS = {
+    'Status': True,
+    'CreatedAt': '2018-05-17T10:35:18.1234567+10:00',
+    'CreatedBy': 'pytest-automation',
+    'Reason': 'Test',
+    'DataSetType': 'Status',
+    '_ts': 1526517318,
+}
+BENCH_ITEMS = 100000
+
+
+def posts(count):
+    return [{'userId': i % 10, 'id': i, 'title': f'title {i}', 'body': 'body'} for i in range(count)]
+
+
+def test_validStatus():
+    assert apischema.validator('GetStatus')(STATUS) is None
+    assert apischema.validator('SetStatus')(dict(STATUS, Extra=1)) is None, 'expected extra SetStatus fields ok'
+    assert apischema.validator('GetStatus') is apischema.validator('GetStatus'), 'expected the compiled validator cached'
+
+
+@pytest.mark.parametrize("change, problem", [
+    ({'Status': 1}, 'Status: expected bool but found 1'),
+    ({'_ts': True}, '_ts: expected int but found True'),
+    ({'CreatedAt': '17/05/2018 10:35'}, "CreatedAt: expected an ISO 8601 timestamp but found '17/05/2018 10:35'"),
+    ({'CreatedBy': ' '}, "CreatedBy: expected a non empty string but found ' '"),
+    ({'Extra': 1}, 'expected fields'),
+])
+def test_invalidStatus(change, problem):
+    assert problem in apischema.validator('GetStatus')(dict(STATUS, **change))
+
+
+def test_setStatusOptional():
+    setStatus = apischema.validator('SetStatus')
+    assert setStatus({'Status': False, 'CreatedBy': 'pytest-automation'}) is None, \
+        'expected only the echoed set fields required'
+    assert 'CreatedAt: expected an ISO 8601 timestamp' in setStatus(dict(STATUS, CreatedAt='17/05/2018 10:35'))
+    assert 'expected fields' in setStatus({'Status': False})
+
+
+def test_optionalFields():
+    check = apischema.compileSchema({'fields': {'id': int}, 'optional': {'note': (str, type(None))}})
+    assert check({'id': 1}) is None
+    assert check({'id': 1, 'note': None}) is None
+    assert check({'id': 1, 'note': 2}) == 'note: expected str|NoneType but found 2'
+    assert check({'note': 'a'}).startswith("expected fields ['id'] (optional ['note']) but found ['note']")
+
+
+def test_arrayResponse():
+    items = posts(1000)
+    assert apischema.validator('posts')(items) is None
+    items[500]['title'] = None
+    assert apischema.validator('posts')(items) == 'item 500: title: expected str but found None'
+    assert apischema.validator('posts')({'id': 1}) == 'expected an array but found dict'
+
+
+def test_verifyResponseSchema():
+    resp = requests.Response()
+    resp.status_code = 200
+    resp.headers['Content-Type'] = 'application/json'
+    resp.raw = io.BytesIO(json.dumps(dict(STATUS, Status='on')).encode())
+    with pytest.raises(AssertionError, match="schema=GetStatus: Status: expected bool but found 'on'"):
+        apitest.verifyResponse(resp, schema='GetStatus')
+
+
+@pytest.mark.bench
+def test_schemaThroughput(record_property):
+    items = posts(BENCH_ITEMS)
+    check = apischema.validator('posts')
+    start = time.perf_counter()
+    assert check(items) is None
+    itemsPerSec = round(BENCH_ITEMS / (time.perf_counter() - start))
+    record_property('itemsPerSec', itemsPerSec)
+    print(f'\n{BENCH_ITEMS} items: {itemsPerSec} items/sec')
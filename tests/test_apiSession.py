@@ -0,0 +1,81 @@
+import pytest
+import json
+import threading
+import requests
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import apitest
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive
+
+    def do_GET(self):
+        self.reply()
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        self.reply()
+
+    def reply(self):
+        server = self.server
+        server.calls.append((self.command, self.path, self.client_address[1]))
+        if self.path == '/slow':
+            server.release.wait(5)
+        status = server.failures.pop(0) if server.failures else 200
+        body = json.dumps({'path': self.path}).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stubServer():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+    server.daemon_threads = True
+    server.handle_error = lambda request, clientAddress: None  # the timed out client is gone when /slow replies
+    server.calls = []
+    server.failures = []
+    server.release = threading.Event()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server, f'http://127.0.0.1:{server.server_address[1]}'
+    server.release.set()
+    server.shutdown()
+    server.server_close()
+
+
+def test_keepAlive(stubServer):
+    server, baseUrl = stubServer
+    with apitest.createHttpSession() as http:
+        for i in range(5):
+            assert apitest.verifyResponse(http.get(f'{baseUrl}/get{i}')) == {'path': f'/get{i}'}
+        apitest.postJson(http, f'{baseUrl}/post', {'Status': True})
+    clientPorts = {port for _, _, port in server.calls}
+    assert len(server.calls) == 6 and len(clientPorts) == 1, f'expected one pooled connection but found ports={clientPorts}'
+
+
+def test_retriesIdempotentOnly(stubServer):
+    server, baseUrl = stubServer
+    with apitest.createHttpSession(retries=2, backoffSeconds=0) as http:
+        server.failures = [503, 503]
+        assert http.get(f'{baseUrl}/get').status_code == 200
+        assert len(server.calls) == 3, 'expected the GET retried until it succeeds'
+
+        server.failures = [503]
+        assert http.post(f'{baseUrl}/post', json={}).status_code == 503
+        assert len(server.calls) == 4, 'expected a POST not retried'
+
+        server.failures = [503] * 3
+        assert http.get(f'{baseUrl}/get').status_code == 503, 'expected the last response once retries run out'
+
+
+def test_defaultTimeout(stubServer):
+    server, baseUrl = stubServer
+    with apitest.createHttpSession(retries=0, timeout=(1, 0.2)) as http:
+        with pytest.raises(requests.exceptions.ConnectionError, match='Read timed out'):
+            http.get(f'{baseUrl}/slow')
@@ -1,7 +1,7 @@
 import pytest
-import requests
 import anytest
 import apitest
+import loadtest
 
 
 GET_ENDPOINT = 'GetStatus'
@@ -18,27 +18,16 @@ def setStatusUrl(apiBaseUrl, apiCode):
     return f'{apiBaseUrl}/{SET_ENDPOINT}?code={apiCode}'
 
 
-def test_getStatus(getStatusUrl):
-    resp = requests.get(getStatusUrl)
-    jresp = apitest.verifyResponse(resp, isJson=True, respCodeRange=(200, 299))
-    expectedFields = [
-        'Status',
-        'CreatedAt',
-        'CreatedBy',
-        'Reason',
-        # comes from CosmosDB
-        'DataSetType',
-        '_ts',
-    ]
+def test_getStatus(http, getStatusUrl):
+    # fields, types and formats are checked by the GET_ENDPOINT schema, see apischema.API_SCHEMAS
+    jresp = getStatus(http, getStatusUrl)
     print(f"\ngot status={jresp}")
-    assert set(expectedFields) == set(jresp.keys()), f'resp={resp.text}'
 
 
 @pytest.fixture(scope='function')
-def apiStatus(getStatusUrl, setStatusUrl):
+def apiStatus(http, getStatusUrl, setStatusUrl):
     # read, remember current status
-    resp = requests.get(getStatusUrl)
-    jresp = apitest.verifyResponse(resp, isJson=True, respCodeRange=(200, 299))
+    jresp = getStatus(http, getStatusUrl)
     beforeStatus = jresp['Status']
     restoreData = {
         'Status': beforeStatus,
@@ -47,10 +36,10 @@ def apiStatus(getStatusUrl, setStatusUrl):
     }
     yield beforeStatus
 
-    setStatus(setStatusUrl, restoreData, 'Restore status back')
+    setStatus(http, setStatusUrl, restoreData, 'Restore status back')
 
 
-def test_setStatusToggle(apiStatus, getStatusUrl, setStatusUrl):
+def test_setStatusToggle(apiStatus, http, getStatusUrl, setStatusUrl):
     newStatus = not apiStatus
     creator = anytest.ID
     statusData = {
@@ -58,21 +47,49 @@ def test_setStatusToggle(apiStatus, getStatusUrl, setStatusUrl):
         'CreatedBy': creator,
         'Reason': 'Test'
     }
-    jresp = setStatus(setStatusUrl, statusData, 'Change status')
+    jresp = setStatus(http, setStatusUrl, statusData, 'Change status')
 
     # verify new status in response
     assert jresp['Status'] is newStatus, f'resp={jresp}'
     assert jresp['CreatedBy'] == creator, f'resp={jresp}'
 
     # verify new status in a separate API call
-    respGet = requests.get(getStatusUrl)
-    jrespGet = apitest.verifyResponse(respGet, isJson=True, respCodeRange=(200, 299))
+    jrespGet = getStatus(http, getStatusUrl)
     assert jrespGet['Status'] is newStatus, f'respGet={jrespGet}'
     assert jrespGet['CreatedBy'] == creator, f'respGet={jrespGet}'
 
 
-def setStatus(setStatusUrl, statusData, msg='Set status'):
+@pytest.mark.load
+def test_statusUnderLoad(apiStatus, config, getStatusUrl, setStatusUrl, record_property):
+    # every setEvery-th request re-sets the current status, the apiStatus fixture restores it afterwards
+    setEvery = config.get('API_LOAD_SET_EVERY', 10)
+    statusData = {'Status': apiStatus, 'CreatedBy': anytest.ID, 'Reason': 'Load test'}
+
+    async def sendRequest(session, idx):
+        if setEvery and idx % setEvery == setEvery - 1:
+            async with session.post(setStatusUrl, json=statusData) as resp:
+                await resp.read()
+        else:
+            async with session.get(getStatusUrl) as resp:
+                await resp.read()
+        return resp.status
+
+    clients = config.get('API_LOAD_CLIENTS', 10)
+    result = loadtest.runLoad(sendRequest, clients, config.get('API_LOAD_DURATION_SECONDS', 30),
+        config.get('API_LOAD_REQUESTS'), config.get('API_READ_TIMEOUT_SECONDS', 30))
+    summary = result.summary()
+    for name, value in summary.items():
+        record_property(name, value)
+    print(f'\n{clients} clients: {summary}')
+    loadtest.verifySlo(summary, config.get('API_LOAD_SLO', {}), f'errors={result.errors[:10]} ')
+
+
+def getStatus(http, getStatusUrl):
+    return apitest.verifyResponse(http.get(getStatusUrl), isJson=True, respCodeRange=(200, 299), schema=GET_ENDPOINT)
+
+
+def setStatus(http, setStatusUrl, statusData, msg='Set status'):
     print(f'\n{msg}: request={statusData}')
-    resp = requests.post(setStatusUrl, json=statusData)
+    resp = http.post(setStatusUrl, json=statusData)
     # print(f"got resp={resp.status_code}: {resp.text}")
-    return apitest.verifyResponse(resp, isJson=True, respCodeRange=(200, 299))
+    return apitest.verifyResponse(resp, isJson=True, respCodeRange=(200, 299), schema=SET_ENDPOINT)
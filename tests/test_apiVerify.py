@@ -0,0 +1,79 @@
+import pytest
+import io
+import json
+import requests
+import apitest
+
+
+POST_FIELDS = {'userId': int, 'id': int, 'title': str, 'body': str}
+
+
+class UntouchedBodyResponse(requests.Response):
+    @property
+    def text(self):
+        raise AssertionError('expected the response text only read for a failure message')
+
+
+def makeResponse(body, status=200, contentType='application/json; charset=utf-8', responseType=requests.Response):
+    resp = responseType()
+    resp.status_code = status
+    resp.headers['Content-Type'] = contentType
+    resp.raw = io.BytesIO(body)
+    return resp
+
+
+def postsBody(count):
+    posts = [{'userId': i % 10, 'id': i, 'title': f'tïtle {i}', 'body': 'x' * (i % 50)} for i in range(count)]
+    return json.dumps(posts, indent=1).encode()
+
+
+def test_errCtxLazy():
+    resp = makeResponse(b'{"Status": true}', responseType=UntouchedBodyResponse)
+    assert apitest.verifyResponse(resp, respCodeRange=(200, 299)) == {'Status': True}
+
+
+def test_errCtxOnFailure():
+    resp = makeResponse(b'{"error": "not found"}', status=404)
+    with pytest.raises(AssertionError, match='code=404 .*url=x response={"error": "not found"}'):
+        apitest.verifyResponse(resp, 'url=x ', respCodeRange=(200, 299))
+
+
+@pytest.mark.parametrize("chunkSize", [1, 7, 64 * 1024])
+def test_iterJsonArray(chunkSize):
+    body = postsBody(200)
+    chunks = (body[i:i + chunkSize] for i in range(0, len(body), chunkSize))
+    assert list(apitest.iterJsonArray(chunks)) == json.loads(body)
+
+
+@pytest.mark.parametrize("body", [b' [ ] ', b'[1, 23, -4.5e2, "a,]", [1, [2]], {"a": [3]}, null, true]'])
+def test_iterJsonArrayValues(body):
+    chunks = (body[i:i + 2] for i in range(0, len(body), 2))
+    assert list(apitest.iterJsonArray(chunks)) == json.loads(body)
+
+
+@pytest.mark.parametrize("body, error", [
+    (b'{"a": 1}', 'expected "\\["'),
+    (b'[1, 2', 'array not closed'),
+    (b'[1 2]', 'expected "," or "\\]"'),
+])
+def test_iterJsonArrayInvalid(body, error):
+    with pytest.raises(ValueError, match=error):
+        list(apitest.iterJsonArray([body]))
+
+
+def test_verifyJsonArray():
+    resp = makeResponse(postsBody(1000), responseType=UntouchedBodyResponse)
+    assert apitest.verifyJsonArray(resp, apitest.fieldTypes(POST_FIELDS), chunkSize=1000) == 1000
+
+
+def test_verifyJsonArrayProblems():
+    posts = json.loads(postsBody(30))
+    for post in posts[::2]:
+        post['id'] = str(post['id'])
+    del posts[1]['body']
+    resp = makeResponse(json.dumps(posts).encode())
+    with pytest.raises(AssertionError, match='16 of 30 items invalid') as e:
+        apitest.verifyJsonArray(resp, apitest.fieldTypes(POST_FIELDS), maxProblems=3)
+    assert str(e.value).count('\n  item') == 3, 'expected only maxProblems reported'
+    assert "item 0: id: expected int but found '0'" in str(e.value)
+    assert "item 1: expected fields ['body', 'id', 'title', 'userId'] (optional []) but found ['id', 'title', 'userId']" in str(e.value)
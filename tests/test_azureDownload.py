@@ -0,0 +1,208 @@
+import pytest
+import os
+import datetime
+import threading
+from types import SimpleNamespace
+from azure.common import AzureHttpError
+from azure.storage.file.models import File, Directory
+import azuretest
+import bidtest
+import conftest
+
+
+STORE_CONFIG = {
+    'STORAGE_ACCOUNT': 'fake-account',
+    'STORAGE_LOCATION': 'fake-share',
+    'STORAGE_DOWNLOAD_WORKERS': 4,
+    'STORAGE_DOWNLOAD_BACKOFF_SECONDS': 0,
+}
+
+
+class FakeFileService:
+    def __init__(self, files, failures=None, pageSize=5):
+        self.files = {}  # name -> (bytes, etag) in the one fake directory
+        self.failures = dict(failures or {})  # name -> count of downloads that break off half way
+        self.pageSize = pageSize
+        self.requests = []
+        self.pagesListed = 0
+        self._uploads = 0
+        self._lock = threading.Lock()
+        for name, content in files.items():
+            self.upload(name, content)
+
+    def upload(self, name, content):
+        self._uploads += 1
+        self.files[name] = (content, f'"0x{self._uploads:x}"')
+
+    def exists(self, share_name, directory_name=None, file_name=None):
+        return True
+
+    def list_directories_and_files(self, share_name, directory_name=None, **kwargs):
+        listed = [Directory('subdir')] + [File(name) for name in sorted(self.files)]
+        for idx in range(0, len(listed), self.pageSize):
+            self.pagesListed += 1
+            yield from listed[idx:idx + self.pageSize]
+
+    def get_file_properties(self, share_name, directory_name, file_name, **kwargs):
+        content, etag = self.files[file_name]
+        file = File(file_name)
+        file.properties.content_length = len(content)
+        file.properties.etag = etag
+        file.properties.last_modified = datetime.datetime(2018, 1, 31, tzinfo=datetime.timezone.utc)
+        return file
+
+    def get_file_to_path(self, share_name, directory_name, file_name, file_path, open_mode='wb', start_range=None, **kwargs):
+        content = self.files[file_name][0][start_range or 0:]
+        with self._lock:
+            self.requests.append((file_name, start_range))
+            fail = self.failures.get(file_name, 0) > 0
+            if fail:
+                self.failures[file_name] -= 1
+        with open(file_path, open_mode) as f:
+            if fail:
+                f.write(content[:len(content) // 2])
+                raise AzureHttpError('connection reset', 500)
+            f.write(content)
+
+
+def fakeFiles(count):
+    return {f'bid{i:03d}.txt': os.urandom(1000 + i) for i in range(count)}
+
+
+def download(fs, targetDir, **config):
+    azuretest.downloadStoredFiles(dict(STORE_CONFIG, **config), None, 'fake-dir', str(targetDir), fs)
+
+
+def localFiles(targetDir):
+    return [f for f in os.listdir(str(targetDir)) if f != azuretest.SYNC_MANIFEST]
+
+
+def test_downloadConcurrently(tmp_path):
+    files = dict(fakeFiles(20), **{'skip.bin': b'not a bid file'})
+    fs = FakeFileService(files)
+    download(fs, tmp_path)
+    assert sorted(localFiles(tmp_path)) == sorted(f for f in files if f.endswith('.txt'))
+    assert fs.pagesListed == 5, 'expected the whole listing paged through'
+    for fname in localFiles(tmp_path):
+        assert (tmp_path / fname).read_bytes() == files[fname], f'file={fname} content differs'
+
+
+def test_downloadEmptyFile(tmp_path):
+    fs = FakeFileService({'a.txt': b'abc', 'empty.csv': b''})
+    download(fs, tmp_path)
+    assert (tmp_path / 'empty.csv').read_bytes() == b''
+    assert (tmp_path / 'a.txt').read_bytes() == b'abc'
+    assert [name for name, _ in fs.requests] == ['a.txt'], 'expected nothing fetched for an empty file'
+
+
+def test_downloadRetryResumes(tmp_path):
+    files = fakeFiles(3)
+    fs = FakeFileService(files, failures={'bid001.txt': 2})
+    download(fs, tmp_path)
+    assert (tmp_path / 'bid001.txt').read_bytes() == files['bid001.txt']
+    retries = [start for name, start in fs.requests if name == 'bid001.txt']
+    half = len(files['bid001.txt']) // 2
+    assert retries == [None, half, half + (len(files['bid001.txt']) - half) // 2], \
+        f'expected each retry to resume where the previous one stopped but found ranges={retries}'
+
+
+def test_downloadGivesUp(tmp_path):
+    files = fakeFiles(2)
+    fs = FakeFileService(files, failures={'bid000.txt': 5})
+    with pytest.raises(AzureHttpError):
+        download(fs, tmp_path, STORAGE_DOWNLOAD_TRIES=2)
+    assert (tmp_path / ('bid000.txt' + azuretest.PART_SUFFIX)).exists(), 'expected partial download kept to resume'
+
+    fs.failures.clear()
+    download(fs, tmp_path)
+    assert (tmp_path / 'bid000.txt').read_bytes() == files['bid000.txt']
+    assert fs.requests[-1][1], 'expected the next run to resume the partial download'
+
+
+def test_syncOnlyChanges(tmp_path):
+    files = fakeFiles(4)
+    fs = FakeFileService(files)
+    download(fs, tmp_path)
+    fs.requests.clear()
+
+    fs.upload('bid001.txt', b're-uploaded, same name')
+    fs.upload('bid009.txt', b'new file')
+    del fs.files['bid002.txt']
+    download(fs, tmp_path)
+    assert sorted(name for name, _ in fs.requests) == ['bid001.txt', 'bid009.txt'], \
+        f'expected only changed and new files downloaded but found requests={fs.requests}'
+    assert sorted(localFiles(tmp_path)) == ['bid000.txt', 'bid001.txt', 'bid003.txt', 'bid009.txt']
+    assert (tmp_path / 'bid001.txt').read_bytes() == b're-uploaded, same name'
+
+
+class ManifestWatchingFileService(FakeFileService):
+    # records which files the manifest on disk lists when each download starts
+    def __init__(self, files, manifestPath):
+        super().__init__(files)
+        self.manifestPath = manifestPath
+        self.savedFiles = []
+
+    def get_file_to_path(self, share_name, directory_name, file_name, file_path, **kwargs):
+        saved = azuretest.SyncManifest(self.manifestPath).files if os.path.exists(self.manifestPath) else {}
+        self.savedFiles.append(len(saved))
+        return super().get_file_to_path(share_name, directory_name, file_name, file_path, **kwargs)
+
+
+def test_manifestSavedPeriodically(tmp_path):
+    fs = ManifestWatchingFileService(fakeFiles(5), str(tmp_path / azuretest.SYNC_MANIFEST))
+    download(fs, tmp_path, STORAGE_DOWNLOAD_WORKERS=1, STORAGE_MANIFEST_SAVE_EVERY=2)
+    assert fs.savedFiles == [0, 0, 2, 2, 4], 'expected progress saved every 2 files, not only when the sync ends'
+    assert len(azuretest.SyncManifest(fs.manifestPath).files) == 5
+
+
+def test_manifestSavedAtomically(tmp_path):
+    download(FakeFileService(fakeFiles(2)), tmp_path)
+    assert sorted(os.listdir(str(tmp_path))) == ['.syncmanifest.json', 'bid000.txt', 'bid001.txt'], 'expected no temp file left'
+    assert sorted(azuretest.SyncManifest(str(tmp_path / azuretest.SYNC_MANIFEST)).files) == ['bid000.txt', 'bid001.txt']
+
+
+def test_syncRestartsPartOfChangedFile(tmp_path):
+    fs = FakeFileService(fakeFiles(1), failures={'bid000.txt': 1})
+    with pytest.raises(AzureHttpError):
+        download(fs, tmp_path, STORAGE_DOWNLOAD_TRIES=1)
+
+    fs.upload('bid000.txt', b'changed while partially downloaded')
+    download(fs, tmp_path)
+    assert fs.requests[-1] == ('bid000.txt', None), 'expected a changed file downloaded from the start'
+    assert (tmp_path / 'bid000.txt').read_bytes() == b'changed while partially downloaded'
+
+
+@pytest.fixture
+def controllerDownloads(monkeypatch):
+    downloads = []
+
+    def download(config, accountKey, sourceDir, targetDir):
+        downloads.append(sourceDir)
+    monkeypatch.setattr(azuretest, 'downloadStoredFiles', download)
+    envConfig = {'BID_FILES_DIR': bidtest.STORAGE_PREFIX + '2018/05/17'}
+
+    def configureNodes(*args, nodeCount=2):
+        # the controller config seen by each xdist node, args relative to the repo root
+        controller = SimpleNamespace(envConfig=envConfig, args=list(args), getoption=lambda name: None,
+            invocation_params=SimpleNamespace(dir=os.path.dirname(os.path.dirname(os.path.abspath(bidtest.__file__)))))
+        nodes = [SimpleNamespace(config=controller, workerinput={}) for _ in range(nodeCount)]
+        for node in nodes:
+            conftest.pytest_configure_node(node)
+        return [SimpleNamespace(config=SimpleNamespace(envConfig=envConfig, workerinput=n.workerinput)) for n in nodes]
+    return configureNodes, downloads
+
+
+@pytest.mark.parametrize("args", [['tests'], ['tests/test_bidFiles.py::test_filename'], ['tests/test_ftp.py', 'tests/']])
+def test_workerReusesControllerDownload(controllerDownloads, args):
+    configureNodes, downloads = controllerDownloads
+    workers = configureNodes(*args)
+    assert downloads == ['2018/05/17'], 'expected the controller to sync once for all workers'
+    assert [bidtest.readCacheBidFilesDir(worker) for worker in workers] == [bidtest.localPath('2018/05/17')] * 2
+    assert downloads == ['2018/05/17'], 'expected the workers to reuse the synced dir'
+
+
+def test_controllerSkipsDownloadWithoutBidFileTests(controllerDownloads):
+    configureNodes, downloads = controllerDownloads
+    workers = configureNodes('tests/test_apiSession.py', 'tests/test_bidCache.py')
+    assert downloads == [] and all(bidtest.WORKER_FILES_DIR not in w.config.workerinput for w in workers), \
+        'expected no sync when no bid file tests are selected'
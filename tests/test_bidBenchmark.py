@@ -0,0 +1,103 @@
+import pytest
+import os
+import json
+import time
+import tracemalloc
+import bidgen
+import bidschema
+import bidtest
+
+
+BENCH_FILE_COUNTS = [1, 100, 10000]
+BENCH_MIN_SECONDS = 1.0  # small runs are repeated until timing is stable
+
+
+def parseFile(dirPath, fname):
+    doc = bidtest.BidDocument(fname, bidtest.mapTextFile(os.path.join(dirPath, fname), verbose=False))
+    violations = bidschema.validate(doc)
+    doc.close()
+    return violations
+
+
+def test_generatedFileValid(tmp_path):
+    fname = bidgen.bidFileName(0)
+    serviceTypes = list(bidschema.SERVICE_TYPES)
+    (tmp_path / fname).write_text(bidgen.generateBidFile(fname, bids=len(serviceTypes), serviceTypes=serviceTypes, units=3))
+    violations = parseFile(str(tmp_path), fname)
+    assert violations == [], f'generated file={fname} expected valid but found {violations}'
+
+
+@pytest.mark.parametrize("defect", list(bidgen.DEFECTS))
+def test_generatedFileDefect(tmp_path, defect):
+    fname = bidgen.bidFileName(0)
+    (tmp_path / fname).write_text(bidgen.generateBidFile(fname, defect=defect))
+    groups = {v.group for v in parseFile(str(tmp_path), fname)}
+    assert groups == {defect}, f'defect="{bidgen.DEFECTS[defect]}" expected violations in {defect} but found {groups}'
+
+
+@pytest.fixture(scope='module')
+def benchFiles(tmp_path_factory):
+    dirPath = str(tmp_path_factory.mktemp('bidbench'))
+    fnames = bidgen.generateBidFiles(dirPath, max(BENCH_FILE_COUNTS), defectEvery=10)
+    return dirPath, fnames
+
+
+@pytest.mark.bench
+@pytest.mark.parametrize("fileCount", BENCH_FILE_COUNTS)
+def test_parseValidateThroughput(benchFiles, fileCount, config, record_property):
+    dirPath, fnames = benchFiles
+    fnames = fnames[:fileCount]
+    fileBytes = sum(os.path.getsize(os.path.join(dirPath, f)) for f in fnames)
+
+    def runAll():
+        for fname in fnames:
+            parseFile(dirPath, fname)
+
+    runs = 0
+    start = time.perf_counter()
+    while runs == 0 or time.perf_counter() - start < BENCH_MIN_SECONDS:
+        runAll()
+        runs += 1
+    elapsed = time.perf_counter() - start
+
+    # separate pass, tracemalloc slows allocation down too much to time under it
+    tracemalloc.start()
+    runAll()
+    _, peakBytes = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    result = {
+        'filesPerSec': round(runs * len(fnames) / elapsed, 1),
+        'mbPerSec': round(runs * fileBytes / elapsed / 1e6, 2),
+        'peakMB': round(peakBytes / 1e6, 2),
+    }
+    for name, value in result.items():
+        record_property(name, value)
+    print(f'\n{fileCount} files ({fileBytes / 1e6:.1f} MB): {result}')
+    verifyNoRegression(config, str(fileCount), result)
+
+
+# --- Verify helpers ---
+
+
+def verifyNoRegression(config, key, result):
+    baselinePath = config.get('BID_BENCH_BASELINE', 'tmp/bidbench.json')
+    maxRegression = config.get('BID_BENCH_MAX_REGRESSION', 0.25)
+    baseline = {}
+    if os.path.exists(baselinePath):
+        with open(baselinePath) as f:
+            baseline = json.load(f)
+    if key not in baseline:
+        print(f'no baseline for {key} files, recording it in {baselinePath}')
+        baseline[key] = result
+        os.makedirs(os.path.dirname(baselinePath) or '.', exist_ok=True)
+        with open(baselinePath, 'w') as f:
+            json.dump(baseline, f, indent=2)
+        return
+
+    expected = baseline[key]
+    errCtx = f'{key} files: baseline={expected} in {baselinePath}, found={result}'
+    assert result['filesPerSec'] >= expected['filesPerSec'] * (1 - maxRegression), \
+        errCtx + f': files/sec regressed more than {maxRegression:.0%}'
+    assert result['peakMB'] <= expected['peakMB'] * (1 + maxRegression), \
+        errCtx + f': peak memory grew more than {maxRegression:.0%}'
@@ -0,0 +1,130 @@
+import pytest
+import os
+import pickle
+import bidgen
+import bidtest
+
+
+class CountingSource(bidtest.LocalFileSource):
+    def __init__(self, dirPath):
+        super().__init__(dirPath)
+        self.opened = []
+
+    def open(self, fname):
+        self.opened.append(fname)
+        return bidtest.mapTextFile(f'{self.dirPath}/{fname}', verbose=False)
+
+
+@pytest.fixture
+def bidDir(tmp_path):
+    dirPath = str(tmp_path / 'bids')
+    bidgen.generateBidFiles(dirPath, 4)
+    return dirPath
+
+
+def isClosed(doc):
+    return doc.fileLines._buffer.closed
+
+
+def test_evictClosesUnleased(bidDir):
+    source = CountingSource(bidDir)
+    cache = bidtest.BidFileCache(source, maxFiles=2)
+    fnames = sorted(source.fnames)
+    held = cache.get(fnames[0])  # leased like a module-scoped fixture holds it
+    docs = []
+    for fname in fnames[1:]:
+        docs.append(cache.get(fname))
+        cache.get(fname)  # a second lease of the same file
+        cache.release(fname)
+        assert not isClosed(docs[-1]), 'expected a document kept open while it is still leased'
+        cache.release(fname)
+    assert all(isClosed(doc) for doc in docs[:-1]), 'expected released documents beyond maxFiles closed'
+    assert not isClosed(docs[-1]), 'expected the last released document kept cached'
+    assert not isClosed(held), 'expected a leased document never evicted'
+
+
+def test_evictLeastRecentlyUsed(bidDir):
+    source = CountingSource(bidDir)
+    cache = bidtest.BidFileCache(source, maxFiles=2)
+    fnames = sorted(source.fnames)
+    docs = []
+    for fname in fnames[:2]:
+        docs.append(cache.get(fname))
+        cache.release(fname)
+    assert cache.get(fnames[0]) is docs[0], 'expected a released document reused while cached'
+    cache.release(fnames[0])
+    third = cache.get(fnames[2])
+    assert isClosed(docs[1]) and not isClosed(docs[0]) and not isClosed(third), \
+        'expected the least recently used released document closed when a third is loaded'
+    assert source.opened == fnames[:3], 'expected each file opened once'
+
+
+class StaleDocument:
+    pass
+
+
+def parseCacheEntries(cacheDir):
+    return sorted(f for f in os.listdir(cacheDir) if not f.endswith('.tmp'))
+
+
+def loadAll(cache, bidDir, fnames):
+    return [cache.load(fname, bidtest.mapTextFile(os.path.join(bidDir, fname), verbose=False)) for fname in fnames]
+
+
+@pytest.fixture
+def noParse(monkeypatch):
+    def parse(self, lines):
+        raise AssertionError('expected the document loaded from the parse cache')
+    return lambda: monkeypatch.setattr(bidtest.BidDocument, '_parse', parse)
+
+
+def test_parseCacheHit(bidDir, tmp_path, noParse):
+    fnames = sorted(os.listdir(bidDir))
+    parsed = loadAll(bidtest.BidParseCache(str(tmp_path / 'cache'), 1 << 30), bidDir, fnames)
+    noParse()
+    cached = loadAll(bidtest.BidParseCache(str(tmp_path / 'cache'), 1 << 30), bidDir, fnames)
+    for doc, fromCache in zip(parsed, cached):
+        assert fromCache.fname == doc.fname and fromCache.sectionNames() == doc.sectionNames()
+        assert fromCache.fileLines[:] == doc.fileLines[:], 'expected the cached document attached to its file'
+
+
+def test_parseCacheVersion(bidDir, tmp_path, monkeypatch):
+    cacheDir = str(tmp_path / 'cache')
+    loadAll(bidtest.BidParseCache(cacheDir, 1 << 30), bidDir, sorted(os.listdir(bidDir))[:2])
+    assert all(f.startswith(f'v{bidtest.PARSER_VERSION}-') for f in parseCacheEntries(cacheDir))
+    monkeypatch.setattr(bidtest, 'PARSER_VERSION', bidtest.PARSER_VERSION + 1)
+    cache = bidtest.BidParseCache(cacheDir, 1 << 30)
+    assert parseCacheEntries(cacheDir) == [] and cache.totalBytes == 0, 'expected entries of other versions dropped'
+
+
+def test_parseCacheEvicts(bidDir, tmp_path):
+    cacheDir = str(tmp_path / 'cache')
+    fnames = sorted(os.listdir(bidDir))
+    cache = bidtest.BidParseCache(cacheDir, 1 << 30)
+    loadAll(cache, bidDir, fnames[:1])
+    entrySize = cache.totalBytes
+    cache = bidtest.BidParseCache(cacheDir, int(entrySize * 2.5))
+    loadAll(cache, bidDir, fnames)
+    assert len(parseCacheEntries(cacheDir)) == 2 and cache.totalBytes <= cache.maxBytes, \
+        f'expected the cache bounded to maxBytes={cache.maxBytes} but found {parseCacheEntries(cacheDir)}'
+
+
+@pytest.mark.parametrize("stale", ['corrupt', 'empty', 'unknownClass'])
+def test_parseCacheStaleEntry(bidDir, tmp_path, monkeypatch, stale):
+    cacheDir = str(tmp_path / 'cache')
+    fname = sorted(os.listdir(bidDir))[0]
+    doc, = loadAll(bidtest.BidParseCache(cacheDir, 1 << 30), bidDir, [fname])
+    entry = os.path.join(cacheDir, parseCacheEntries(cacheDir)[0])
+    if stale == 'unknownClass':  # pickled by code that has changed since
+        monkeypatch.setattr(StaleDocument, '__module__', 'bidtest')
+        monkeypatch.setattr(bidtest, 'StaleDocument', StaleDocument, raising=False)
+        content = pickle.dumps(StaleDocument())
+        monkeypatch.delattr(bidtest, 'StaleDocument')
+    else:
+        content = b'not a pickle' if stale == 'corrupt' else b''
+    with open(entry, 'wb') as f:
+        f.write(content)
+    reparsed, = loadAll(bidtest.BidParseCache(cacheDir, 1 << 30), bidDir, [fname])
+    assert reparsed.sectionNames() == doc.sectionNames(), 'expected a stale entry parsed again'
+    with open(entry, 'rb') as f:
+        assert isinstance(pickle.load(f), bidtest.BidDocument), 'expected the stale entry replaced'
@@ -0,0 +1,88 @@
+import os
+import pytest
+import bidmanifest
+
+
+pytest_plugins = ['pytester']
+
+# bid file tests of the inner session, each run appends "<test> <file>" to ran.log
+BID_TESTS = '''
+import pytest
+import anytest
+import bidtest
+
+
+def pytest_generate_tests(metafunc):
+    if 'bidFile' in metafunc.fixturenames:
+        envConfig = anytest.readCacheEnvConfig(metafunc)
+        fromPath = bidtest.readCacheBidFilesDir(metafunc)
+        metafunc.parametrize("bidFile", sorted(bidtest.readCacheBidFiles(metafunc, fromPath, envConfig)), scope='module')
+
+
+def logRun(test, bidFile):
+    with open('ran.log', 'a') as f:
+        f.write(f'{test} {bidFile}\\n')
+
+
+def test_replayed(bidFile):
+    logRun('test_replayed', bidFile)
+
+
+@pytest.mark.noreplay
+def test_alwaysRun(bidFile):
+    logRun('test_alwaysRun', bidFile)
+'''
+
+
+@pytest.fixture
+def incremental(pytester, monkeypatch):
+    # the repo conftest runs a session over bids/, its manifest digests code.py as one of the CODE_FILES
+    testsDir = os.path.dirname(os.path.abspath(__file__))
+    with open(os.path.join(testsDir, 'conftest.py')) as f:
+        pytester.makeconftest(f.read())
+    pytester.makefile('.yml', config='\n'.join([
+        'env:',
+        '  dev-local:',
+        '    BID_FILES_DIR: bids',
+        '    BID_MANIFEST_PATH: tmp/bidmanifest.json',
+    ]))
+    pytester.makepyfile(test_bids=BID_TESTS)
+    pytester.mkdir('bids')
+    for fname in ['a.txt', 'b.txt']:
+        pytester.path.joinpath('bids', fname).write_text(f'bid file {fname}\n')
+    pytester.path.joinpath('code.py').write_text('# version 1\n')
+    monkeypatch.setattr(bidmanifest, 'CODE_FILES', bidmanifest.CODE_FILES + [str(pytester.path / 'code.py')])
+
+    def run():
+        logPath = pytester.path / 'ran.log'
+        if logPath.exists():
+            logPath.unlink()
+        result = pytester.runpytest('--incremental', '-p', 'no:cacheprovider')
+        result.assert_outcomes(passed=4)
+        return sorted(logPath.read_text().splitlines()) if logPath.exists() else []
+    return pytester, run
+
+
+ALL_RUN = ['test_alwaysRun a.txt', 'test_alwaysRun b.txt', 'test_replayed a.txt', 'test_replayed b.txt']
+
+
+def test_replayUnchanged(incremental):
+    pytester, run = incremental
+    assert run() == ALL_RUN, 'expected every test to run without a manifest'
+    assert run() == ['test_alwaysRun a.txt', 'test_alwaysRun b.txt'], \
+        'expected unchanged files replayed except for noreplay tests'
+
+
+def test_replayFileChanged(incremental):
+    pytester, run = incremental
+    run()
+    pytester.path.joinpath('bids', 'b.txt').write_text('bid file b.txt, version 2\n')
+    assert run() == ['test_alwaysRun a.txt', 'test_alwaysRun b.txt', 'test_replayed b.txt'], \
+        'expected the changed file tested again'
+
+
+def test_replayCodeChanged(incremental):
+    pytester, run = incremental
+    run()
+    pytester.path.joinpath('code.py').write_text('# version 2\n')
+    assert run() == ALL_RUN, 'expected a code change to drop every stored result'
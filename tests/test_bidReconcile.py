@@ -0,0 +1,97 @@
+import pytest
+import random
+import sqlite3
+import datetime
+import bidgen
+import bidreconcile
+import bidtest
+import dbtest
+
+
+SETTLE_DATE = datetime.date(2018, 5, 17)  # bidgen trading date
+
+
+@pytest.fixture
+def bidFiles(tmp_path):
+    dirPath = str(tmp_path)
+    fnames = bidgen.generateBidFiles(dirPath, 3, defectEvery=3, bids=2, serviceTypes=['ENERGY', 'RAISE6SEC'], units=2)
+    return bidtest.BidFileCache(bidtest.LocalFileSource(dirPath), maxFiles=2), fnames
+
+
+@pytest.fixture
+def bidValues(bidFiles):
+    cache, fnames = bidFiles
+    values, skipped = bidreconcile.collectUnitLimits(cache, SETTLE_DATE, fnames)
+    assert skipped == [fnames[2]], 'expected the file with a defect skipped'
+    return values
+
+
+@pytest.fixture
+def sqliteConn(bidValues):
+    conn = sqlite3.connect(':memory:')
+    conn.execute('CREATE TABLE BidUnitLimits (settlementDate TEXT, duid TEXT, serviceType TEXT, '
+        'tradingInterval INTEGER, maxAvailability INTEGER, mrCapacity INTEGER)')
+    conn.executemany('INSERT INTO BidUnitLimits VALUES (?, ?, ?, ?, ?, ?)',
+        [(str(SETTLE_DATE),) + key + values for key, values in bidValues.items()])
+    yield conn
+    conn.close()
+
+
+def readDbRows(conn):
+    query = 'SELECT duid, serviceType, tradingInterval, maxAvailability, mrCapacity FROM BidUnitLimits WHERE settlementDate = ?'
+    return dbtest.iterRows(conn.cursor(), query, (str(SETTLE_DATE),))
+
+
+def test_collectUnitLimits(bidValues):
+    assert len(bidValues) == 3 * 48, 'expected 3 distinct units with 48 intervals, later versions replacing earlier'
+    assert bidValues[('BATTLOADID', 'ENERGY', 48)][1] is None, 'expected a blank MR Capacity for the load'
+    assert bidValues[('BATTGENID', 'ENERGY', 48)][1] == 0
+    assert bidValues[('BATTGENID', 'RAISE6SEC', 48)][1] is None, 'expected no MR Capacity for FCAS'
+    assert all(isinstance(v[0], int) for v in bidValues.values())
+
+
+def test_collectLatestVersion(bidFiles, bidValues):
+    cache, fnames = bidFiles
+    latest, _ = bidreconcile.collectUnitLimits(cache, SETTLE_DATE, [fnames[1]])
+    outOfOrder, _ = bidreconcile.collectUnitLimits(cache, SETTLE_DATE, [fnames[1], fnames[2], fnames[0]])
+    assert bidValues == latest, 'expected the values of the latest valid version'
+    assert outOfOrder == latest, 'expected files listed out of order read in version order'
+
+
+def test_collectLatestDate(tmp_path):
+    # the last version of one day comes before the first version of the next
+    fnames = [bidgen.bidFileName(998), bidgen.bidFileName(997)]
+    assert fnames == ['aemo_benchOFFER_20180201_002.txt', 'aemo_benchOFFER_20180131_999.txt']
+    for seed, fname in enumerate(fnames):
+        with open(tmp_path / fname, 'w') as f:
+            f.write(bidgen.generateBidFile(fname, rand=random.Random(seed)))
+    cache = bidtest.BidFileCache(bidtest.LocalFileSource(str(tmp_path)), maxFiles=2)
+    assert bidreconcile.byVersion(fnames) == fnames[::-1]
+    latest, _ = bidreconcile.collectUnitLimits(cache, SETTLE_DATE, fnames[:1])
+    earlier, _ = bidreconcile.collectUnitLimits(cache, SETTLE_DATE, fnames[1:])
+    both, _ = bidreconcile.collectUnitLimits(cache, SETTLE_DATE, fnames)
+    assert latest != earlier, 'expected the two days to bid different values'
+    assert both == latest, 'expected the values of the later day despite its lower version'
+
+
+def test_collectKeepsLeased(bidFiles):
+    cache, fnames = bidFiles
+    held = cache.get(fnames[0])
+    bidreconcile.collectUnitLimits(cache, SETTLE_DATE, fnames)
+    assert cache.isLeased(fnames[0]) and not held.fileLines._buffer.closed, 'expected a held document left open'
+    assert not cache.isLeased(fnames[1])
+
+
+def test_reconcileMatches(bidValues, sqliteConn):
+    assert bidreconcile.reconcile(bidValues, readDbRows(sqliteConn)) == {'missing': [], 'unexpected': [], 'mismatched': []}
+
+
+def test_reconcileDifferences(bidValues, sqliteConn):
+    sqliteConn.execute("DELETE FROM BidUnitLimits WHERE duid = 'BATTGENID' AND serviceType = 'ENERGY' AND tradingInterval = 1")
+    sqliteConn.execute("UPDATE BidUnitLimits SET maxAvailability = -1 WHERE duid = 'BATTLOADID' AND tradingInterval = 2")
+    sqliteConn.execute("INSERT INTO BidUnitLimits VALUES ('2018-05-17', 'OTHERID', 'ENERGY', 1, 1, 0)")
+    result = bidreconcile.reconcile(bidValues, readDbRows(sqliteConn))
+    assert result['missing'] == [('BATTGENID', 'ENERGY', 1)]
+    assert result['unexpected'] == [('OTHERID', 'ENERGY', 1)]
+    (key, bidValue, dbValue), = result['mismatched']
+    assert key == ('BATTLOADID', 'ENERGY', 2) and dbValue == (-1, None) and bidValue[0] != -1
@@ -0,0 +1,85 @@
+import pytest
+import os
+from azure.storage.file.models import File
+import bidgen
+import bidschema
+import bidtest
+
+
+class FakeStreamFileService:
+    def __init__(self, files):
+        self.files = files  # name -> bytes in the one fake directory
+        self.streamed = []
+
+    def list_directories_and_files(self, share_name, directory_name=None, **kwargs):
+        for name, content in self.files.items():
+            listed = File(name)
+            listed.properties.content_length = len(content)
+            yield listed
+
+    def get_file_properties(self, share_name, directory_name, file_name, **kwargs):
+        file = File(file_name)
+        file.properties.content_length = len(self.files[file_name])
+        return file
+
+    def get_file_to_stream(self, share_name, directory_name, file_name, stream, **kwargs):
+        self.streamed.append(file_name)
+        content = self.files[file_name]
+        for idx in range(0, len(content), 4096):
+            stream.write(content[idx:idx + 4096])
+
+
+@pytest.fixture
+def storedFiles():
+    fnames = [bidgen.bidFileName(i) for i in range(4)]
+    files = {f: bidgen.generateBidFile(f, defect='BID FILE' if i == 3 else None).encode() for i, f in enumerate(fnames)}
+    files['AEMO_BENCHOFFER_20180131_002_ACK.csv'] = b'ack'
+    return files
+
+
+def streamSource(files, saveDir=None):
+    return bidtest.StorageStreamSource(FakeStreamFileService(files), 'fake-share', 'fake-dir', saveDir)
+
+
+def test_streamValidate(storedFiles):
+    source = streamSource(storedFiles)
+    assert source.fnames == list(storedFiles)[:4], 'expected only bid files, responses are listed separately'
+    assert 'AEMO_BENCHOFFER_20180131_002_ACK.csv' in source.listAll()
+    cache = bidtest.BidFileCache(source, maxFiles=2)
+    groups = []
+    for fname in source.fnames:
+        doc = cache.get(fname)
+        assert doc.fileLines[:] == storedFiles[fname].decode().splitlines(), f'file={fname} lines differ'
+        groups.append({v.group for v in bidschema.validate(doc)})
+        cache.release(fname)
+    assert groups == [set(), set(), set(), {'BID FILE'}]
+
+
+def test_streamReusesBuffers(storedFiles):
+    source = streamSource(storedFiles)
+    cache = bidtest.BidFileCache(source, maxFiles=1)
+    buffers = set()
+    for fname in source.fnames * 3:
+        doc = cache.get(fname)
+        buffers.add(id(doc.fileLines._buffer))
+        cache.release(fname)
+    assert len(buffers) == 1, f'expected one buffer reused for files read one at a time but found {len(buffers)}'
+
+
+def test_streamPrefetchesNext(storedFiles):
+    source = streamSource(storedFiles)
+    cache = bidtest.BidFileCache(source, maxFiles=2)
+    cache.expectOrder(source.fnames)
+    cache.get(source.fnames[0])
+    source._pending[source.fnames[1]].result()
+    assert source.fs.streamed == source.fnames[:2], 'expected the next file streamed ahead'
+    cache.get(source.fnames[1])
+    assert source.fs.streamed.count(source.fnames[1]) == 1, 'expected the prefetched file not streamed again'
+
+
+def test_streamSaves(storedFiles, tmp_path):
+    source = streamSource(storedFiles, str(tmp_path))
+    cache = bidtest.BidFileCache(source, maxFiles=2)
+    cache.get(source.fnames[0])
+    assert (tmp_path / source.fnames[0]).read_bytes() == storedFiles[source.fnames[0]]
+    assert os.listdir(str(tmp_path)) == [source.fnames[0]]
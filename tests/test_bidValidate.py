@@ -0,0 +1,39 @@
+import pytest
+import os
+import csv
+import json
+import bidgen
+import bidvalidate
+
+
+@pytest.fixture
+def bidDir(tmp_path):
+    dirPath = str(tmp_path / 'bids')
+    bidgen.generateBidFiles(dirPath, 10, defectEvery=5)  # 2 files with defects
+    return dirPath
+
+
+def test_validateDirectory(bidDir):
+    report = bidvalidate.validateDirectory(bidDir)
+    assert report['files'] == 10, f'report={report}'
+    assert report['invalidFiles'] == 2, f'report={report}'
+    invalid = sorted({(v['file'], v['group']) for v in report['violations']})
+    expected = [(bidgen.bidFileName(4), 'BID FILE'), (bidgen.bidFileName(9), 'DUID serviceType')]
+    assert invalid == expected, f'violations={report["violations"]}'
+
+
+@pytest.mark.parametrize("fmt", list(bidvalidate.REPORT_WRITERS))
+def test_cliReport(bidDir, tmp_path, fmt):
+    output = str(tmp_path / f'report.{fmt}')
+    exitCode = bidvalidate.main([bidDir, '--format', fmt, '--output', output])
+    assert exitCode == 1, 'expected exit code 1 when files have violations'
+    with open(output, newline='') as f:
+        rows = list(csv.DictReader(f)) if fmt == 'csv' else json.load(f)['violations']
+    assert sorted({r['file'] for r in rows}) == [bidgen.bidFileName(4), bidgen.bidFileName(9)], f'rows={rows}'
+
+
+def test_cliValidDir(tmp_path):
+    dirPath = str(tmp_path / 'bids')
+    bidgen.generateBidFiles(dirPath, 3)
+    assert bidvalidate.main([dirPath, '--parse-cache', str(tmp_path / 'cache')]) == 0
+    assert len(os.listdir(str(tmp_path / 'cache'))) == 3, 'expected a parse cache entry per file'
@@ -0,0 +1,152 @@
+import pytest
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pydocumentdb.errors import HTTPFailure
+import azuretest
+
+
+COSMOS_CONFIG = {
+    'COSMOSDB_COLL_PATH': 'dbs/fake-db/colls/fake-coll',
+    'COSMOSDB_WAIT_SECONDS': 2,
+    'COSMOSDB_POLL_SECONDS': 0.01,
+}
+
+
+class FakeDocumentClient:
+    def __init__(self, rangeIds=('0',)):
+        self.rangeIds = rangeIds
+        self.changes = {rangeId: [] for rangeId in rangeIds}  # per range feed of doc versions
+        self.docs = {}
+        self.requests = []  # (kind, id count, options)
+        self.last_response_headers = {}
+        self._lock = threading.Lock()
+
+    def write(self, doc, rangeId='0'):
+        with self._lock:
+            self.docs[doc['id']] = doc
+            self.changes[rangeId].append(doc)
+
+    def ReadPartitionKeyRanges(self, collection_link, feed_options=None):
+        return [{'id': rangeId} for rangeId in self.rangeIds]
+
+    def QueryDocumentsChangeFeed(self, collection_link, options=None):
+        with self._lock:
+            feed = self.changes[options['partitionKeyRangeId']]
+            start = int(options['continuation']) if 'continuation' in options else len(feed)
+            self.last_response_headers = {'etag': str(len(feed))}
+            return feed[start:]
+
+    def QueryDocuments(self, collection_link, query, options=None):
+        # only the parameterized "c.id IN (...)" queries of getCosmosDocsByIds
+        ids = {p['value'] for p in query['parameters']}
+        self.requests.append(('query', len(ids), options))
+        return [doc for doc in self.docs.values() if doc['id'] in ids and self._inPartition(doc, options)]
+
+    def ReadDocument(self, document_link, options=None):
+        docid = document_link.split('/')[-1]
+        self.requests.append(('read', 1, options))
+        if docid not in self.docs or not self._inPartition(self.docs[docid], options):
+            raise HTTPFailure(404, 'Resource Not Found')
+        return self.docs[docid]
+
+    def _inPartition(self, doc, options):
+        return 'partitionKey' not in (options or {}) or doc.get('duid') == options['partitionKey']
+
+
+@pytest.fixture
+def fakeClient():
+    return FakeDocumentClient(rangeIds=('0', '1'))
+
+
+@pytest.fixture
+def waiter(fakeClient):
+    waiter = azuretest.CosmosChangeFeedWaiter(fakeClient, COSMOS_CONFIG['COSMOSDB_COLL_PATH'], pollSeconds=0.01)
+    yield waiter
+    waiter.stop()
+
+
+def test_waiterServesConcurrentWaits(fakeClient, waiter):
+    docIds = [f'doc{i}' for i in range(8)]
+    with ThreadPoolExecutor(max_workers=len(docIds)) as pool:
+        futures = [pool.submit(azuretest.getCosmosDocById, COSMOS_CONFIG, None, docid, waiter=waiter) for docid in docIds]
+        time.sleep(0.05)
+        for i, docid in enumerate(docIds):
+            fakeClient.write({'id': docid, 'n': i}, rangeId=str(i % 2))
+        docs = [future.result() for future in futures]
+    assert [doc['n'] for doc in docs] == list(range(len(docIds)))
+
+
+def test_waiterStartsFromNow(fakeClient):
+    fakeClient.write({'id': 'before'})
+    waiter = azuretest.CosmosChangeFeedWaiter(fakeClient, COSMOS_CONFIG['COSMOSDB_COLL_PATH'], pollSeconds=0.01)
+    try:
+        fakeClient.write({'id': 'after'})
+        assert waiter.wait('after', 2) == {'id': 'after'}
+        with pytest.raises(AssertionError):
+            waiter.wait('before', 0.1)
+    finally:
+        waiter.stop()
+
+
+def test_rangesOfPydocumentdbClient():
+    class PydocumentdbClient:  # pydocumentdb 2.3.5 has no public ReadPartitionKeyRanges
+        def _ReadPartitionKeyRanges(self, collection_link, feed_options=None):
+            return [{'id': '0'}, {'id': '1'}]
+    assert azuretest.readPartitionKeyRangeIds(PydocumentdbClient(), COSMOS_CONFIG['COSMOSDB_COLL_PATH']) == ['0', '1']
+
+
+def test_waiterReportsDroppedDocs(fakeClient):
+    waiter = azuretest.CosmosChangeFeedWaiter(fakeClient, COSMOS_CONFIG['COSMOSDB_COLL_PATH'], pollSeconds=0.01, maxDocs=2)
+    try:
+        for i in range(3):
+            fakeClient.write({'id': f'doc{i}'})
+        assert waiter.wait('doc2', 2) == {'id': 'doc2'}
+        with pytest.raises(AssertionError, match='older docs dropped=1 past maxDocs=2'):
+            waiter.wait('doc0', 0.1)
+    finally:
+        waiter.stop()
+
+
+def test_waiterReturnsLatestVersion(fakeClient, waiter):
+    fakeClient.write({'id': 'doc', 'version': 1})
+    fakeClient.write({'id': 'doc', 'version': 2})
+    time.sleep(0.05)
+    assert waiter.wait('doc', 2)['version'] == 2
+
+
+def test_pointReadWaitsForDoc(fakeClient):
+    threading.Timer(0.05, fakeClient.write, [{'id': 'late', 'duid': 'BATTGENID'}]).start()
+    doc = azuretest.getCosmosDocById(COSMOS_CONFIG, fakeClient, 'late', partitionKey='BATTGENID')
+    assert doc['id'] == 'late'
+
+
+def test_docsByIdsBatched(fakeClient):
+    for i in range(250):
+        fakeClient.write({'id': f'doc{i:03d}', 'duid': 'BATTGENID' if i % 2 else 'BATTLOADID'})
+    docids = [f'doc{i:03d}' for i in range(250)] + ['nope1', 'nope2']
+    found, missing = azuretest.getCosmosDocsByIds(COSMOS_CONFIG, fakeClient, docids)
+    assert len(found) == 250 and missing == ['nope1', 'nope2'], f'missing={missing}'
+    assert [n for _, n, _ in fakeClient.requests] == [100, 100, 52], \
+        f'expected cross partition IN queries of up to 100 ids but found {fakeClient.requests}'
+
+
+def test_docsByIdsGroupedByPartition(fakeClient):
+    for i in range(6):
+        fakeClient.write({'id': f'doc{i}', 'duid': 'BATTGENID' if i < 5 else 'BATTLOADID'})
+    partitionKeys = {f'doc{i}': 'BATTGENID' for i in range(5)}
+    partitionKeys.update({'doc5': 'BATTLOADID', 'doc6': 'BATTLOADID', 'doc7': 'BATTGENID'})
+    found, missing = azuretest.getCosmosDocsByIds(COSMOS_CONFIG, fakeClient, list(partitionKeys) + ['doc8'], partitionKeys)
+    assert sorted(found) == [f'doc{i}' for i in range(6)] and missing == ['doc6', 'doc7', 'doc8']
+    assert sorted((kind, n, str(opts)) for kind, n, opts in fakeClient.requests) == [
+        ('query', 1, "{'enableCrossPartitionQuery': True}"),
+        ('query', 2, "{'partitionKey': 'BATTLOADID'}"),
+        ('query', 6, "{'partitionKey': 'BATTGENID'}"),
+    ], f'expected one query per partition but found {fakeClient.requests}'
+
+
+def test_docsByIdsPointRead(fakeClient):
+    fakeClient.write({'id': 'doc', 'duid': 'BATTGENID'})
+    found, missing = azuretest.getCosmosDocsByIds(COSMOS_CONFIG, fakeClient, ['doc', 'doc'], {'doc': 'BATTGENID'})
+    assert list(found) == ['doc'] and missing == []
+    assert fakeClient.requests == [('read', 1, {'partitionKey': 'BATTGENID'})]
@@ -9,6 +9,14 @@ def test_sqlDBTableNotEmpty(dbConn, tableName):
     dbtest.readOneRow(cursor, query)
 
 
+@pytest.mark.parametrize("tableName", ['Table1', ])
+def test_sqlDBTableUniqueIds(dbConn, tableName, config):
+    cursor, prefix = dbConn
+    rows = dbtest.iterRows(cursor, f'SELECT autoId FROM {tableName} ORDER BY autoId', arraysize=config.get('DB_ARRAYSIZE', 1000))
+    stats = dbtest.RowAggregates(keyOf=lambda row: row[0], sortedKeys=True).addAll(rows)
+    assert stats.duplicateCount == 0, f'table={tableName} expected unique autoId but found {stats.summary()} e.g. {stats.duplicates}'
+
+
 def test_cosmosDBCollectionExists(config, cosmosClient):
     sql = f"SELECT * from c where c.id = 'i-dont-exist'"
     resultsIter = cosmosClient.QueryDocuments(config['COSMOSDB_COLL_PATH'], sql)
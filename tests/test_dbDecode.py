@@ -0,0 +1,64 @@
+import pytest
+import struct
+import time
+import dbtest
+
+
+DESCRIPTION = [('autoId',), ('duid',), ('settlementDate',)] + [(f'band{i}',) for i in range(1, 11)]
+DTO = struct.pack('<6hI2h', 2017, 3, 16, 10, 35, 18, 123456700, -6, 0)
+BENCH_ROWS = 100000
+
+
+class DescribedCursor:
+    def __init__(self, description, rows):
+        self.description = description
+        self._rows = rows
+
+    def fetchall(self):
+        return self._rows
+
+
+def benchRows(count):
+    return [(i, 'BATTGENID', DTO) + tuple(range(10)) for i in range(count)]
+
+
+# the per value and per row decoding that was used before, kept as the benchmark reference
+def unpackDatetimeoffset(dtoValue):
+    tup = struct.unpack("<6hI2h", dtoValue)
+    tweaked = [tup[i] // 100 if i == 6 else tup[i] for i in range(len(tup))]
+    return "{:04d}-{:02d}-{:02d} {:02d}:{:02d}:{:02d}.{:07d} {:+03d}:{:02d}".format(*tweaked)
+
+
+def decodeEachRow(cursor, rows):
+    return [dbtest.addColumnNames(row[:2] + (unpackDatetimeoffset(row[2]),) + row[3:], cursor) for row in rows]
+
+
+def decodeNamedRows(cursor, rows):
+    decode = dbtest.decodeDatetimeoffset
+    return dbtest.namedRows(cursor, [row[:2] + (decode(row[2]),) + row[3:] for row in rows])
+
+
+def test_decodeDatetimeoffset():
+    assert dbtest.decodeDatetimeoffset(DTO) == '2017-03-16 10:35:18.1234567 -06:00'
+    assert dbtest.decodeDatetimeoffset(DTO) == unpackDatetimeoffset(DTO)
+
+
+def test_namedRows():
+    cursor = DescribedCursor([('autoId',), ('duid',), ('MAX(interval)',)], [(1, 'BATTGENID', 48), (2, 'BATTLOADID', 47)])
+    rows = dbtest.fetchNamed(cursor)
+    assert [(row.autoId, row.duid, row._2) for row in rows] == [(1, 'BATTGENID', 48), (2, 'BATTLOADID', 47)]
+    assert type(rows[0]) is type(dbtest.fetchNamed(cursor)[0]), 'expected the row type reused for the same columns'
+
+
+@pytest.mark.bench
+def test_decodeThroughput(record_property):
+    cursor = DescribedCursor(DESCRIPTION, None)
+    rows = benchRows(BENCH_ROWS)
+    result = {}
+    for name, decode in [('eachRow', decodeEachRow), ('namedRows', decodeNamedRows)]:
+        start = time.perf_counter()
+        decoded = decode(cursor, rows)
+        result[name] = round(len(decoded) / (time.perf_counter() - start))
+        record_property(f'{name}RowsPerSec', result[name])
+    print(f'\n{BENCH_ROWS} rows of {len(DESCRIPTION)} columns, rows/sec: {result}')
+    assert result['namedRows'] > result['eachRow'], f'expected named rows to decode faster, rows/sec: {result}'
@@ -0,0 +1,123 @@
+import pytest
+import sqlite3
+import threading
+import pyodbc
+import dbtest
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def execute(self, query):
+        if self.conn.broken:
+            raise pyodbc.Error('08S01', 'communication link failure')
+        self.conn.queries.append(query)
+
+    def fetchall(self):
+        return [(1,)]
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self, connId):
+        self.connId = connId
+        self.broken = False
+        self.closed = False
+        self.rollbackFails = False
+        self.rollbacks = 0
+        self.queries = []
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def rollback(self):
+        if self.rollbackFails:
+            raise pyodbc.Error('08S01', 'communication link failure')
+        self.rollbacks += 1
+
+    def close(self):
+        self.closed = True
+
+
+class FakeConnect:
+    def __init__(self):
+        self.conns = []
+
+    def __call__(self):
+        self.conns.append(FakeConnection(len(self.conns)))
+        return self.conns[-1]
+
+
+def test_poolReusesConnections():
+    connect = FakeConnect()
+    pool = dbtest.ConnectionPool(connect, size=2)
+    for _ in range(3):
+        with pool.lease() as cursor:
+            cursor.execute('SELECT * FROM Table1')
+    assert len(connect.conns) == 1, 'expected sequential leases to reuse one connection'
+    assert connect.conns[0].queries == ['SELECT * FROM Table1', 'SELECT 1'] * 2 + ['SELECT * FROM Table1']
+
+
+def test_poolReplacesBrokenConnection():
+    connect = FakeConnect()
+    pool = dbtest.ConnectionPool(connect, size=2)
+    with pool.lease():
+        pass
+    connect.conns[0].broken = True
+    with pool.lease() as cursor:
+        cursor.execute('SELECT * FROM Table1')
+    assert [c.closed for c in connect.conns] == [True, False]
+    assert pool.reconnects == 1
+
+
+def test_poolLeasesConcurrently():
+    connect = FakeConnect()
+    pool = dbtest.ConnectionPool(connect, size=3, checkoutSeconds=5)
+    leased = []
+    allLeased = threading.Barrier(3)
+
+    def work():
+        with pool.lease() as cursor:
+            leased.append(cursor.conn.connId)
+            allLeased.wait(5)
+
+    threads = [threading.Thread(target=work) for _ in range(3)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert sorted(leased) == [0, 1, 2], 'expected each concurrent lease on its own connection'
+
+
+def test_poolSizeBounded():
+    pool = dbtest.ConnectionPool(FakeConnect(), size=1, checkoutSeconds=0.05)
+    with pool.lease():
+        with pytest.raises(AssertionError):
+            pool.acquire()
+
+
+def test_poolRollsBackOnRelease(tmp_path):
+    dbPath = str(tmp_path / 'pool.db')
+    with sqlite3.connect(dbPath) as conn:
+        conn.execute('CREATE TABLE Table1 (name TEXT)')
+    pool = dbtest.ConnectionPool(lambda: sqlite3.connect(dbPath), size=1)
+    with pool.lease() as cursor:
+        cursor.execute("INSERT INTO Table1 (name) VALUES ('uncommitted')")
+    with pool.lease() as cursor:
+        cursor.execute('SELECT COUNT(*) FROM Table1')
+        assert cursor.fetchall() == [(0,)], 'expected the uncommitted insert of the previous lease rolled back'
+    pool.close()
+
+
+def test_poolDropsConnectionFailingRollback():
+    connect = FakeConnect()
+    pool = dbtest.ConnectionPool(connect, size=1)
+    with pool.lease() as cursor:
+        cursor.conn.rollbackFails = True
+    with pool.lease():
+        pass
+    assert [c.closed for c in connect.conns] == [True, False], 'expected a new connection after a failed rollback'
+    assert connect.conns[1].rollbacks == 1
@@ -0,0 +1,117 @@
+import pytest
+import sqlite3
+from types import SimpleNamespace
+import dbtest
+
+
+class IdentityCursor:
+    # records the statements seededTable sends to a SQL Server table with an IDENTITY column
+    def __init__(self, conn):
+        self.conn = conn
+        self.description = None
+
+    def execute(self, sql):
+        self.conn.executed.append(sql)
+        if sql.startswith('SELECT * FROM') and sql.endswith('WHERE 1 = 0'):
+            self.description = [('autoId',), ('name',)]
+
+    def executemany(self, sql, rows):
+        self.conn.executed.append(sql)
+
+    def columns(self, table, schema=None):
+        return [SimpleNamespace(column_name='autoId', type_name='int identity'),
+            SimpleNamespace(column_name='name', type_name='nvarchar')]
+
+    def fetchall(self):
+        raise AssertionError('expected the backup to stay on the server')
+
+    def close(self):
+        pass
+
+
+class IdentityConnection:
+    def __init__(self):
+        self.executed = []
+
+    def cursor(self):
+        return IdentityCursor(self)
+
+    def getinfo(self, infoType):
+        return 'Microsoft SQL Server'
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+
+@pytest.fixture
+def sqliteConn():
+    conn = sqlite3.connect(':memory:')
+    conn.execute('CREATE TABLE Bids (autoId INTEGER PRIMARY KEY, duid TEXT, interval INTEGER)')
+    conn.executemany('INSERT INTO Bids (duid, interval) VALUES (?, ?)', [('BATTGENID', 1), ('BATTLOADID', 2)])
+    conn.commit()
+    yield conn
+    conn.close()
+
+
+def readAll(conn):
+    return conn.execute('SELECT * FROM Bids ORDER BY autoId').fetchall()
+
+
+def test_seedAndRestore(sqliteConn):
+    before = readAll(sqliteConn)
+    rows = (('UNIT', i % 48 + 1) for i in range(25000))
+    with dbtest.seededTable(sqliteConn, 'Bids', ['duid', 'interval'], rows, fastExecutemany=False, batchSize=10000):
+        assert sqliteConn.execute('SELECT COUNT(*), MIN(interval), MAX(interval) FROM Bids').fetchone() == (25000, 1, 48)
+    assert readAll(sqliteConn) == before, 'expected the original rows restored'
+    assert tableNames(sqliteConn) == ['Bids'], 'expected the backup table dropped'
+
+
+def tableNames(conn):
+    return sorted(row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'"))
+
+
+def test_restoreFailureKeepsBackup(sqliteConn):
+    before = readAll(sqliteConn)
+    with pytest.raises(sqlite3.Error):
+        with dbtest.seededTable(sqliteConn, 'Bids', ['duid', 'interval'], [('UNIT', 1)], fastExecutemany=False):
+            sqliteConn.execute('ALTER TABLE Bids RENAME TO Renamed')
+    assert tableNames(sqliteConn) == ['Bids_seedBackup', 'Renamed']
+    assert sqliteConn.execute('SELECT * FROM Bids_seedBackup ORDER BY autoId').fetchall() == before
+
+
+@pytest.mark.parametrize("identityInsert, restore", [
+    (None, ['SET IDENTITY_INSERT dbo.Table1 ON',
+        'INSERT INTO dbo.Table1 (autoId, name) SELECT autoId, name FROM dbo.Table1_seedBackup',
+        'SET IDENTITY_INSERT dbo.Table1 OFF']),
+    (False, ['INSERT INTO dbo.Table1 (name) SELECT name FROM dbo.Table1_seedBackup']),
+])
+def test_identityRestore(identityInsert, restore):
+    conn = IdentityConnection()
+    with dbtest.seededTable(conn, 'dbo.Table1', ['name'], [('Yuri',)], identityInsert=identityInsert):
+        conn.executed.clear()
+    assert conn.executed == ['SELECT * FROM dbo.Table1_seedBackup WHERE 1 = 0', 'DELETE FROM dbo.Table1'] + restore + \
+        ['DROP TABLE dbo.Table1_seedBackup']
+
+
+def test_seedFailureRollsBack(sqliteConn):
+    before = readAll(sqliteConn)
+    with pytest.raises(sqlite3.Error):
+        with dbtest.seededTable(sqliteConn, 'Bids', ['duid', 'nope'], [('UNIT', 1)], fastExecutemany=False):
+            pass
+    assert readAll(sqliteConn) == before, 'expected a failed seed to roll back its delete'
+    assert tableNames(sqliteConn) == ['Bids'], 'expected the backup table dropped'
+
+
+@pytest.mark.parametrize("ext, content", [
+    ('csv', 'duid,interval\nBATTGENID,1\nBATTLOADID,2\n'),
+    ('yml', '- {duid: BATTGENID, interval: 1}\n- {duid: BATTLOADID, interval: 2}\n'),
+])
+def test_loadDataset(tmp_path, ext, content):
+    fpath = tmp_path / f'bids.{ext}'
+    fpath.write_text(content)
+    columns, rows = dbtest.loadDataset(str(fpath))
+    assert columns == ['duid', 'interval']
+    assert [tuple(map(str, r)) for r in rows] == [('BATTGENID', '1'), ('BATTLOADID', '2')]
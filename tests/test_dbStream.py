@@ -0,0 +1,83 @@
+import pytest
+import sqlite3
+import datetime
+import tracemalloc
+import dbtest
+
+
+ROW_COUNT = 200000
+SETTLEMENT_DATES = [datetime.date(2018, 1, 31) + datetime.timedelta(days=d) for d in range(5)]
+
+
+class CountingCursor:
+    def __init__(self, cursor):
+        self._cursor = cursor
+        self.batches = []
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __setattr__(self, name, value):
+        if name == 'arraysize':
+            self._cursor.arraysize = value
+        else:
+            super().__setattr__(name, value)
+
+    def fetchmany(self):
+        rows = self._cursor.fetchmany()
+        self.batches.append(len(rows))
+        return rows
+
+
+@pytest.fixture(scope='module')
+def sqliteConn():
+    conn = sqlite3.connect(':memory:')
+    conn.execute('CREATE TABLE Bids (autoId INTEGER PRIMARY KEY, settlementDate TEXT, price REAL)')
+    rows = ((str(SETTLEMENT_DATES[i % 5]), (i * 7919) % 15000 - 1000.0) for i in range(ROW_COUNT))
+    conn.executemany('INSERT INTO Bids (settlementDate, price) VALUES (?, ?)', rows)
+    conn.execute("INSERT INTO Bids (autoId, settlementDate, price) VALUES (-1, '2018-01-31', 99999)")
+    conn.commit()
+    yield conn
+    conn.close()
+
+
+def test_iterRowsInBatches(sqliteConn):
+    cursor = CountingCursor(sqliteConn.cursor())
+    rows = list(dbtest.iterRows(cursor, 'SELECT autoId FROM Bids WHERE autoId <= ?', (2500,), arraysize=1000, named=True))
+    assert len(rows) == 2501 and rows[0].autoId == -1
+    assert cursor.batches == [1000, 1000, 501, 0]
+
+
+def test_aggregatesPerSettlementDate(sqliteConn):
+    query = 'SELECT autoId, settlementDate, price FROM Bids ORDER BY autoId'
+    stats = dbtest.RowAggregates(keyOf=lambda row: row.settlementDate, groupOf=lambda row: row.settlementDate,
+        valueOf=lambda row: row.price, maxDuplicates=3)
+    stats.addAll(dbtest.iterRows(sqliteConn.cursor(), query, named=True))
+    assert stats.summary() == {'count': ROW_COUNT + 1, 'duplicates': ROW_COUNT - 4, 'groups': 5}
+    assert stats.duplicates == ['2018-01-31', '2018-01-31', '2018-02-01'], 'expected only the first duplicates kept'
+    expected = sqliteConn.execute('SELECT settlementDate, MIN(price), MAX(price) FROM Bids GROUP BY settlementDate').fetchall()
+    assert sorted((group, *bounds) for group, bounds in stats.groups.items()) == expected
+
+
+def test_sortedUniqueness(sqliteConn):
+    stats = dbtest.RowAggregates(keyOf=lambda row: row[0], sortedKeys=True)
+    stats.addAll(dbtest.iterRows(sqliteConn.cursor(), 'SELECT autoId FROM Bids ORDER BY autoId'))
+    assert (stats.count, stats.duplicateCount) == (ROW_COUNT + 1, 0)
+    stats.addAll([(ROW_COUNT,), (ROW_COUNT,)])
+    assert stats.duplicates == [ROW_COUNT, ROW_COUNT]
+
+
+def test_streamMemoryConstant(sqliteConn):
+    query = 'SELECT autoId, settlementDate, price FROM Bids ORDER BY autoId'
+
+    def peakBytes(scan):
+        tracemalloc.start()
+        scan()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        return peak
+    fetched = peakBytes(lambda: dbtest.RowAggregates(keyOf=lambda row: row[0], sortedKeys=True).addAll(
+        sqliteConn.execute(query).fetchall()))
+    streamed = peakBytes(lambda: dbtest.RowAggregates(keyOf=lambda row: row[0], sortedKeys=True).addAll(
+        dbtest.iterRows(sqliteConn.cursor(), query)))
+    assert streamed * 10 < fetched, f'expected streaming to hold a fraction of the table but peak={streamed} vs fetchall={fetched}'
@@ -0,0 +1,77 @@
+import pytest
+import sqlite3
+import threading
+import dbtest
+
+
+WATERMARK = 'SELECT MAX(autoId) FROM Bids'
+QUERIES = ["SELECT duid FROM Bids WHERE duid = 'BATTGENID'", "SELECT duid FROM Bids WHERE duid = 'BATTLOADID'"]
+
+
+class BatchCursor:
+    # sqlite runs one statement per execute, this splits a batch and serves its result sets with nextset
+    def __init__(self, conn):
+        self.conn = conn
+        self.executed = []
+        self.roundTrips = 0
+        self._results = []
+
+    def execute(self, sql):
+        self.roundTrips += 1
+        statements = [statement.strip() for statement in sql.split(';')]
+        self.executed += statements
+        self._results = [self.conn.execute(statement).fetchall() for statement in statements]
+        return self
+
+    def fetchall(self):
+        return self._results[0]
+
+    def nextset(self):
+        self._results = self._results[1:]
+        return True if self._results else None
+
+
+@pytest.fixture
+def sqliteConn():
+    conn = sqlite3.connect(':memory:', check_same_thread=False)
+    conn.execute('CREATE TABLE Bids (autoId INTEGER PRIMARY KEY, duid TEXT)')
+    conn.execute("INSERT INTO Bids (duid) VALUES ('OTHERID')")
+    conn.commit()
+    yield conn
+    conn.close()
+
+
+def insertLater(conn, duids, delaySeconds):
+    # one statement, so a waiter on the same connection never sees only some of the rows
+    def insert():
+        conn.execute('INSERT INTO Bids (duid) VALUES ' + ', '.join(['(?)'] * len(duids)), duids)
+        conn.commit()
+    timer = threading.Timer(delaySeconds, insert)
+    timer.start()
+    return timer
+
+
+def test_readResultSets(sqliteConn):
+    cursor = BatchCursor(sqliteConn)
+    assert dbtest.readResultSets(cursor, [WATERMARK, 'SELECT duid FROM Bids']) == [[(1,)], [('OTHERID',)]]
+    assert cursor.roundTrips == 1, 'expected all queries sent in one round-trip'
+    assert dbtest.readResultSets(cursor, [WATERMARK, 'SELECT duid FROM Bids'], batched=False) == [[(1,)], [('OTHERID',)]]
+    assert cursor.roundTrips == 3
+
+
+def test_waitOnWatermark(sqliteConn):
+    cursor = BatchCursor(sqliteConn)
+    timer = insertLater(sqliteConn, ['BATTGENID', 'BATTLOADID'], 0.3)
+    rows = dbtest.waitReadOneRows(cursor, QUERIES, WATERMARK, timeoutSeconds=5, pollSeconds=0.05)
+    timer.join()
+    assert rows == [('BATTGENID',), ('BATTLOADID',)]
+    polls = cursor.executed.count(WATERMARK)
+    assert cursor.executed.count(QUERIES[0]) == 2, \
+        f'expected the queries re-run only once the watermark changed but found {polls} watermark polls'
+
+
+def test_waitTimesOut(sqliteConn):
+    cursor = BatchCursor(sqliteConn)
+    with pytest.raises(pytest.fail.Exception, match='records=\\[0, 0\\]'):
+        dbtest.waitReadOneRows(cursor, QUERIES, WATERMARK, timeoutSeconds=0.2, pollSeconds=0.05)
+    assert cursor.executed.count(QUERIES[0]) == 1, 'expected an unchanged watermark not to re-run the queries'
@@ -1,8 +1,9 @@
 import pytest
 import anytest
+import dbtest
 
 
-def test_deleteInsertSelect(envName, dbConn):
+def test_deleteInsertSelect(envName, dbConn, config):
     anytest.ensureSupportedEnv(envName, ['dev-local'])
 
     if (envName.lower() != 'dev-local'):
@@ -12,12 +13,22 @@ def test_deleteInsertSelect(envName, dbConn):
     dbColumn = 'name'
     expectedValue = 'Yuri'
 
-    cursor.execute(f'DELETE FROM {table}')
-    cursor.execute(f"INSERT INTO {table}({dbColumn}) VALUES('{expectedValue}')")
-    cursor.execute(f'SELECT * FROM {table}')
-    rows = cursor.fetchall()
+    fast = config.get('DB_FAST_EXECUTEMANY', True)
+    with dbtest.seededTable(cursor.connection, table, [dbColumn], [(expectedValue,)], fastExecutemany=fast):
+        cursor.execute(f'SELECT * FROM {table}')
+        rows = cursor.fetchall()
 
     assert len(rows) == 1
     autoId, name = rows[0]
     assert autoId > 0
     assert name == expectedValue
+
+
+def test_seedDataset(envName, dbConn, config):
+    anytest.ensureSupportedEnv(envName, ['dev-local'])
+    cursor, _ = dbConn
+    fast = config.get('DB_FAST_EXECUTEMANY', True)
+    with dbtest.seededDataset(cursor.connection, 'Table1', 'resources/datasets/Table1.csv', fastExecutemany=fast):
+        cursor.execute('SELECT name FROM Table1 ORDER BY name')
+        names = [row[0] for row in cursor.fetchall()]
+    assert names == ['Anna', 'Boris', 'Yuri']